@@ -1,40 +1,71 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from pydantic import BaseModel
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict
 
-from app.db.session import get_db
-from app.db.models import User, UserProfile, Alert
-from app.api.auth import get_current_user
+from app.db.session import get_async_db, get_async_read_db
+from app.db.models import UserProfile, Alert
+from app.api.auth import Message, Principal, get_current_user
+from app.services.security import bump_profile_version
 
 router = APIRouter()
 
 class ThresholdUpdate(BaseModel):
     threshold: int
 
-@router.get("/")
+class AlertOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    user_id: str
+    message: str
+    aqi_level: int | None = None
+    is_read: bool | None = None
+    kind: str | None = None
+    city: str | None = None
+    station_id: str | None = None
+    created_at: datetime | None = None
+
+class AlertList(BaseModel):
+    alerts: list[AlertOut]
+
+class AlertCheck(BaseModel):
+    alerts_created: int
+    message: str
+
+@router.get("/", response_model=AlertList)
 async def get_user_alerts(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    unread_only: bool = False,
+    city: str = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    alerts = db.query(Alert).filter(
-        Alert.user_id == current_user.id
-    ).order_by(Alert.created_at.desc()).limit(50).all()
+    # Served newest-first from (user_id, created_at), (user_id, city,
+    # created_at) or (user_id, is_read, created_at); with both filters the
+    # city index narrows the scan and is_read is checked per row
+    query = select(Alert).where(Alert.user_id == current_user.id)
+    if unread_only:
+        query = query.where(Alert.is_read == False)
+    if city:
+        query = query.where(Alert.city == city)
+
+    alerts = (await db.scalars(query.order_by(Alert.created_at.desc()).limit(50))).all()
     
     return {"alerts": alerts}
 
-@router.post("/threshold")
+@router.post("/threshold", response_model=Message)
 async def set_alert_threshold(
     threshold_data: ThresholdUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     threshold = threshold_data.threshold
     
     if threshold < 0 or threshold > 500:
         raise HTTPException(status_code=400, detail="Threshold must be between 0 and 500")
     
-    profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
+    profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == current_user.id).limit(1))
     if not profile:
         # Create profile if it doesn't exist
         profile = UserProfile(
@@ -45,88 +76,81 @@ async def set_alert_threshold(
     else:
         profile.alert_threshold = threshold
     
-    db.commit()
+    await db.commit()
+    bump_profile_version(current_user.id)
     
     # Create an alert about the threshold change
     alert = Alert(
         user_id=current_user.id,
         message=f"Alert threshold set to {threshold} AQI. You'll receive notifications when AQI exceeds this level.",
-        aqi_level=threshold
+        aqi_level=threshold,
+        kind="threshold_changed"
     )
     db.add(alert)
-    db.commit()
+    await db.commit()
     
     return {"message": f"Alert threshold set to {threshold} AQI"}
 
-@router.post("/check")
+@router.post("/check", response_model=AlertCheck)
 async def check_alerts(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Check current AQI against user's threshold and create alerts if needed
     """
-    profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
-    if not profile or not profile.alert_threshold:
+    # The threshold comes with the authenticated principal, no profile query
+    if not current_user.alert_threshold:
         return {"alerts_created": 0, "message": "No alert threshold set"}
     
-    # Get current AQI data
+    # Get current AQI data, preferring the latest ingested snapshot
     from app.services.external_apis import get_pakistan_cities_data
-    aqi_data = await get_pakistan_cities_data()
-    
-    alerts_created = 0
-    threshold = profile.alert_threshold
-    
-    for city_data in aqi_data["data"]:
-        if city_data["aqi"] > threshold:
-            # Check if we already have a recent alert for this city (last 6 hours)
-            recent_alert = db.query(Alert).filter(
-                Alert.user_id == current_user.id,
-                Alert.message.like(f"%{city_data['city']}%"),
-                Alert.created_at >= datetime.utcnow() - timedelta(hours=6)
-            ).first()
-            
-            if not recent_alert:
-                alert = Alert(
-                    user_id=current_user.id,
-                    message=f"🚨 High AQI Alert for {city_data['city']}: {city_data['aqi']} AQI (Your threshold: {threshold})",
-                    aqi_level=city_data["aqi"]
-                )
-                db.add(alert)
-                alerts_created += 1
-    
-    db.commit()
+    from app.services.ingestion import get_latest_snapshot
+    from app.services.alerting import evaluate_alerts
+    from app.services.notifier import broker
+    aqi_data = get_latest_snapshot() or await get_pakistan_cities_data()
+
+    # Ingestion already evaluates every user on each snapshot; this only
+    # covers the caller in case they set a threshold since the last poll
+    new_alerts = await db.run_sync(evaluate_alerts, aqi_data, user_ids=[current_user.id])
+    broker.publish_alerts(new_alerts)
+    alerts_created = len(new_alerts)
     
     return {
         "alerts_created": alerts_created, 
         "message": f"Created {alerts_created} new alert(s)" if alerts_created > 0 else "No new alerts"
     }
 
-@router.post("/mark-read/{alert_id}")
+@router.post("/mark-read/{alert_id}", response_model=Message)
 async def mark_alert_read(
     alert_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    alert = db.query(Alert).filter(Alert.id == alert_id, Alert.user_id == current_user.id).first()
+    alert = await db.scalar(
+        select(Alert).where(Alert.id == alert_id, Alert.user_id == current_user.id).limit(1)
+    )
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
     alert.is_read = True
-    db.commit()
+    await db.commit()
     
     return {"message": "Alert marked as read"}
 
-@router.post("/mark-all-read")
+@router.post("/mark-all-read", response_model=Message)
 async def mark_all_alerts_read(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db.query(Alert).filter(
-        Alert.user_id == current_user.id,
-        Alert.is_read == False
-    ).update({"is_read": True})
+    # Range scan on (user_id, is_read, created_at) instead of loading rows
+    await db.execute(
+        update(Alert)
+        .where(Alert.user_id == current_user.id, Alert.is_read == False)
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    )
     
-    db.commit()
+    await db.commit()
     
     return {"message": "All alerts marked as read"}
\ No newline at end of file
@@ -1,43 +1,394 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 import random
+import zlib
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, ConfigDict
 
-from app.db.session import get_db
-from app.db.models import Station, Measurement
-from app.services.external_apis import get_current_aqi
+from app.api.auth import Principal, get_current_user
+from app.api.caching import cached_response
+from app.core.config import settings
+from app.db.session import get_async_read_db
+from app.db.models import Station
+from app.services.aqi_index import calculate_aqi_list
+from app.services.export import EXPORT_FORMATS, ExportUnavailable, check_format, export_query, stream_export
+from app.services.external_apis import get_current_aqi, load_current_aqi
+from app.services.ingestion import get_latest_snapshot, get_latest_snapshot_body, get_snapshot_version, parse_timestamp
+from app.services.history import BUCKET_WIDTHS, RESOLUTIONS, pick_resolution, query_station_history, station_has_history
+from app.services.rollups import PERIODS, SCOPES, bucket_start, decode_cursor, query_rollups
+from app.services.serialization import CurrentAqi
+from app.services.spatial import get_readings_index, get_station_index, get_stations_version
+from app.services.tiles import TILE_FORMATS, get_tile, load_grid, tile_etag
 
 router = APIRouter()
 
-@router.get("/current")
+CURRENT_MODES = ("nearest", "idw")
+
+class NeighborReading(BaseModel):
+    station_id: str
+    station_name: str | None = None
+    pm25: float | None = None
+    distance_km: float
+
+class InterpolatedAqi(BaseModel):
+    latitude: float
+    longitude: float
+    mode: str
+    pm25: float | None = None
+    aqi: int | None = None
+    stations: list[NeighborReading]
+    source: str | None = None
+
+class StationOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    name: str
+    city: str
+    latitude: float
+    longitude: float
+    is_active: bool | None = None
+    distance_km: float | None = None
+
+class StationList(BaseModel):
+    stations: list[StationOut]
+
+class HistoryPoint(BaseModel):
+    timestamp: str
+    pm25: float | None = None
+    pm25_min: float | None = None
+    pm25_max: float | None = None
+    aqi: int | None = None
+    aqi_max: int | None = None
+    samples: int | None = None
+
+class History(BaseModel):
+    station_id: str
+    resolution: str | None = None
+    data: list[HistoryPoint]
+    next_cursor: str | None = None
+    source: str | None = None
+
+class StatsBucket(BaseModel):
+    id: str
+    timestamp: str
+    samples: int
+    pm25: float | None = None
+    pm25_max: float | None = None
+    aqi: int | None = None
+    aqi_max: int | None = None
+    over_100: int
+    over_150: int
+    over_200: int
+
+class Stats(BaseModel):
+    scope: str
+    period: str
+    start: str
+    end: str
+    data: list[StatsBucket]
+    next_cursor: str | None = None
+
+@router.get("/current", response_model=CurrentAqi | InterpolatedAqi, response_model_exclude_unset=True)
 async def get_current_aqi_data(
+    request: Request,
     latitude: float = None,
     longitude: float = None,
     city: str = None,
-    db: Session = Depends(get_db)
+    limit: int = None,
+    radius_km: float = None,
+    mode: str = "nearest",
+    db: AsyncSession = Depends(get_async_read_db)
 ):
+    if (latitude is None) != (longitude is None):
+        raise HTTPException(status_code=400, detail="Latitude and longitude must be given together")
+
+    snapshot = get_latest_snapshot()
+    if snapshot:
+        # Serve the background-ingested snapshot instead of going upstream;
+        # it only changes once per ingestion, so clients revalidate by ETag
+        async def build():
+            if latitude is not None:
+                return await get_aqi_near(latitude, longitude, city, limit, radius_km, mode, snapshot, db)
+            if not city:
+                # Encoded once per ingestion
+                return get_latest_snapshot_body()
+            return {
+                **snapshot,
+                "data": [d for d in snapshot["data"] if d["city"].lower() == city.lower()]
+            }
+
+        return await cached_response(
+            request,
+            ("current", get_snapshot_version(), snapshot["ingested_at"]),
+            build,
+            last_modified=datetime.fromisoformat(snapshot["ingested_at"]),
+            model=CurrentAqi | InterpolatedAqi
+        )
+
+    if latitude is not None:
+        return await get_aqi_near(latitude, longitude, city, limit, radius_km, mode, None, db)
     try:
         # Try to get real-time data from external API
-        aqi_data = await get_current_aqi(latitude, longitude, city)
+        aqi_data = await get_current_aqi(city=city)
         return aqi_data
     except Exception as e:
         # Fallback to sample data from database
         return await get_sample_aqi_data(db)
 
-@router.get("/stations")
-async def get_stations(db: Session = Depends(get_db)):
-    stations = db.query(Station).filter(Station.is_active == True).all()
-    return {"stations": stations}
+async def get_aqi_near(latitude, longitude, city, limit, radius_km, mode, snapshot, db):
+    """
+    Readings of the stations nearest to a point, or an inverse-distance-
+    weighted PM2.5 estimate there (mode="idw"). Upstream can't search by
+    coordinates, so the lookup runs over the current readings locally.
+    """
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        raise HTTPException(status_code=400, detail="Invalid coordinates")
+    if mode not in CURRENT_MODES:
+        raise HTTPException(status_code=400, detail=f"Mode must be one of {', '.join(CURRENT_MODES)}")
+    if limit is not None and (limit < 1 or limit > 100):
+        raise HTTPException(status_code=400, detail="Limit must be between 1 and 100")
+    if radius_km is not None and radius_km <= 0:
+        raise HTTPException(status_code=400, detail="Radius must be positive")
+
+    if not snapshot:
+        try:
+            snapshot = await get_current_aqi(city=city)
+        except Exception as e:
+            snapshot = await get_sample_aqi_data(db)
+    index, pm25 = get_readings_index(snapshot)
+
+    if mode == "nearest":
+        return {
+            **snapshot,
+            "data": [
+                {**reading, "distance_km": round(distance, 3)}
+                for reading, distance in index.nearest(latitude, longitude, limit or 5, radius_km)
+            ]
+        }
+
+    value, neighbors = index.interpolate(
+        latitude, longitude, pm25,
+        n=limit or settings.IDW_NEIGHBORS,
+        power=settings.IDW_POWER,
+        radius_km=radius_km
+    )
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "mode": mode,
+        "pm25": round(value, 1) if value is not None else None,
+        "aqi": calculate_aqi_list([value])[0] if value is not None else None,
+        "stations": [
+            {
+                "station_id": reading["station_id"],
+                "station_name": reading.get("station_name"),
+                "pm25": reading["pm25"],
+                "distance_km": round(distance, 3)
+            }
+            for reading, distance in neighbors
+        ],
+        "source": snapshot.get("source")
+    }
+
+@router.get("/stations", response_model=StationList, response_model_exclude_unset=True)
+async def get_stations(
+    request: Request,
+    latitude: float = None,
+    longitude: float = None,
+    limit: int = None,
+    radius_km: float = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    if (latitude is None) != (longitude is None):
+        raise HTTPException(status_code=400, detail="Latitude and longitude must be given together")
+    return await cached_response(
+        request,
+        ("stations", get_stations_version()),
+        lambda: list_stations(latitude, longitude, limit, radius_km, db),
+        model=StationList
+    )
+
+async def list_stations(latitude, longitude, limit, radius_km, db):
+    if latitude is None:
+        stations = (await db.scalars(select(Station).where(Station.is_active == True))).all()
+        return {"stations": stations}
+
+    if limit is not None and (limit < 1 or limit > 1000):
+        raise HTTPException(status_code=400, detail="Limit must be between 1 and 1000")
+    if radius_km is not None and radius_km <= 0:
+        raise HTTPException(status_code=400, detail="Radius must be positive")
+    if limit is None and radius_km is None:
+        limit = 10
+    index = await get_station_index(db)
+    return {
+        "stations": [
+            {**station, "distance_km": round(distance, 3)}
+            for station, distance in index.nearest(latitude, longitude, limit, radius_km)
+        ]
+    }
+
+@router.get("/tiles/{z}/{x}/{y}.{fmt}")
+async def get_aqi_tile(z: int, x: int, y: int, fmt: str, request: Request):
+    """
+    Interpolated AQI over the current readings as a web-mercator z/x/y tile:
+    a translucent PNG overlay, or .f16 for the raw float16 AQI values.
+    Tiles are rendered once per snapshot and revalidated by ETag.
+    """
+    if fmt not in TILE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of {', '.join(TILE_FORMATS)}")
+    if z < 0 or z > settings.TILE_MAX_ZOOM:
+        raise HTTPException(status_code=400, detail=f"Zoom must be between 0 and {settings.TILE_MAX_ZOOM}")
+    if not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        raise HTTPException(status_code=400, detail="Tile out of range")
+
+    snapshot = get_latest_snapshot()
+    if not snapshot:
+        try:
+            # Only cached snapshots: per-request sample data would give every
+            # tile of a map view its own grid and ETag
+            snapshot = await load_current_aqi()
+        except Exception as e:
+            print(f"External API error: {e}")
+            return Response(
+                await get_tile(None, z, x, y, fmt),
+                media_type=TILE_FORMATS[fmt],
+                headers={"Cache-Control": f"public, max-age={settings.TILE_EMPTY_MAX_AGE_SECONDS}"}
+            )
+    grid = await load_grid(snapshot)
 
-@router.get("/historical/{station_id}")
-async def get_historical_data(station_id: str, days: int = 7, db: Session = Depends(get_db)):
-    # For now, return sample historical data
-    # In a real app, this would query the measurements table
-    return generate_sample_historical_data(station_id, days)
+    headers = {
+        "ETag": tile_etag(grid, z, x, y, fmt),
+        "Cache-Control": f"public, max-age={settings.TILE_MAX_AGE_SECONDS}"
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(await get_tile(grid, z, x, y, fmt), media_type=TILE_FORMATS[fmt], headers=headers)
+
+@router.get("/historical/{station_id}", response_model=History, response_model_exclude_unset=True)
+async def get_historical_data(
+    station_id: str,
+    days: int = 7,
+    resolution: str = None,
+    cursor: str = None,
+    limit: int = 1000,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    if days < 1 or days > 365:
+        raise HTTPException(status_code=400, detail="Days must be between 1 and 365")
+    if limit < 1 or limit > 5000:
+        raise HTTPException(status_code=400, detail="Limit must be between 1 and 5000")
+
+    resolution = resolution or pick_resolution(days)
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"Resolution must be one of {', '.join(RESOLUTIONS)}")
+
+    try:
+        # Stored times are naive UTC, so an offset-aware cursor is converted
+        cursor_time = parse_timestamp(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    end = datetime.utcnow()
+    # The history queries are shared with the sync scripts, so run them on
+    # the async session's connection instead of duplicating them
+    history = await db.run_sync(
+        query_station_history, station_id, end - timedelta(days=days), end,
+        resolution=resolution, cursor=cursor_time, limit=limit
+    )
+
+    if not history["data"] and not await db.run_sync(station_has_history, station_id):
+        # Stations that have never been ingested (e.g. the seeded demo ones)
+        # keep returning generated data so the charts still render; a real
+        # station with a gap in the window just gets an empty page
+        return generate_sample_historical_data(
+            station_id, end - timedelta(days=days), end, resolution, cursor_time, limit
+        )
+    return history
+
+@router.get("/export")
+async def export_measurements(
+    format: str = "csv",
+    station_id: list[str] = Query(None),
+    city: str = None,
+    start: datetime = None,
+    end: datetime = None,
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Stream raw measurements as an Arrow IPC stream, Parquet or gzip CSV.
+    Rows come off a server-side cursor in fixed-size batches, so memory
+    stays bounded however many rows match.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of {', '.join(EXPORT_FORMATS)}")
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=400, detail="Start must be before end")
+    try:
+        check_format(format)
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"measurements-{datetime.utcnow():%Y%m%dT%H%M%S}.{extension}"
+    return StreamingResponse(
+        stream_export(format, export_query(station_id, city, start, end)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# Default window per period when days isn't given
+STATS_DEFAULT_DAYS = {"hour": 7, "day": 90, "month": 730}
 
-async def get_sample_aqi_data(db: Session):
+@router.get("/stats", response_model=Stats)
+async def get_aqi_stats(
+    scope: str = "city",
+    period: str = "day",
+    id: str = None,
+    days: int = None,
+    cursor: str = None,
+    limit: int = 1000,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Averages, maxima and exceedance counts per city or station, served from
+    the incrementally maintained rollup table
+    """
+    if scope not in SCOPES:
+        raise HTTPException(status_code=400, detail=f"Scope must be one of {', '.join(SCOPES)}")
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"Period must be one of {', '.join(PERIODS)}")
+    days = days or STATS_DEFAULT_DAYS[period]
+    if days < 1 or days > 3650:
+        raise HTTPException(status_code=400, detail="Days must be between 1 and 3650")
+    if limit < 1 or limit > 5000:
+        raise HTTPException(status_code=400, detail="Limit must be between 1 and 5000")
+    try:
+        cursor_key = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    end = datetime.utcnow()
+    # Start on a bucket boundary so the first bucket isn't dropped
+    start = bucket_start(pd.Series([end - timedelta(days=days)]), period)[0].to_pydatetime()
+    page = await db.run_sync(
+        query_rollups, scope, period, start, end, scope_id=id, cursor=cursor_key, limit=limit
+    )
+    return {
+        "scope": scope,
+        "period": period,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        **page
+    }
+
+async def get_sample_aqi_data(db: AsyncSession):
     """Generate sample AQI data for demonstration"""
-    stations = db.query(Station).filter(Station.is_active == True).all()
+    stations = (await db.scalars(select(Station).where(Station.is_active == True))).all()
     
     sample_data = []
     for station in stations:
@@ -49,7 +400,6 @@ async def get_sample_aqi_data(db: Session):
         }.get(station.city, random.uniform(50, 150))
         
         pm25 = max(10, base_pm25 + random.uniform(-20, 20))
-        aqi = calculate_aqi_from_pm25(pm25)
         
         sample_data.append({
             "station_id": station.id,
@@ -58,17 +408,22 @@ async def get_sample_aqi_data(db: Session):
             "latitude": station.latitude,
             "longitude": station.longitude,
             "pm25": round(pm25, 1),
-            "aqi": aqi,
+            "aqi": None,
             "last_updated": datetime.utcnow().isoformat()
         })
+
+    aqi_values = calculate_aqi_list([reading["pm25"] for reading in sample_data])
+    for reading, aqi in zip(sample_data, aqi_values):
+        reading["aqi"] = aqi
     
     return {"data": sample_data, "source": "sample_data"}
 
-def generate_sample_historical_data(station_id: str, days: int):
-    """Generate sample historical data for charts"""
-    data = []
-    base_time = datetime.utcnow() - timedelta(days=days)
-    
+def generate_sample_historical_data(station_id: str, start: datetime, end: datetime, resolution: str, cursor: datetime, limit: int):
+    """
+    Generate sample historical data for charts, paged and downsampled like
+    query_station_history and marked with source "sample". Values are
+    seeded by station and hour, so pages and reloads agree.
+    """
     # Base values for different cities
     base_values = {
         "sample-1": 45,  # Islamabad
@@ -78,39 +433,43 @@ def generate_sample_historical_data(station_id: str, days: int):
     
     base_pm25 = base_values.get(station_id, 75)
     
-    for i in range(days * 24):  # Hourly data for requested days
-        timestamp = base_time + timedelta(hours=i)
-        # Add daily pattern and random variation
-        hour = timestamp.hour
-        if 6 <= hour <= 20:  # Daytime - higher pollution
-            multiplier = 1.2
-        else:  # Nighttime - lower pollution
-            multiplier = 0.8
-            
-        pm25 = base_pm25 * multiplier * (1 + random.uniform(-0.1, 0.1))
-        
-        data.append({
-            "timestamp": timestamp.isoformat(),
-            "pm25": round(pm25, 1),
-            "aqi": calculate_aqi_from_pm25(pm25)
-        })
+    # Hourly data for the requested window
+    timestamps = pd.date_range(pd.Timestamp(start).ceil("h"), end, freq="h")
+    hours = timestamps.hour.to_numpy()
+    # Daily pattern: higher during the day, lower at night
+    multiplier = np.where((hours >= 6) & (hours <= 20), 1.2, 0.8)
+    noise = np.array([
+        np.random.default_rng([zlib.crc32(station_id.encode()), int(timestamp.timestamp())]).uniform(-0.1, 0.1)
+        for timestamp in timestamps
+    ])
+    frame = pd.DataFrame({"pm25": np.round(base_pm25 * multiplier * (1 + noise), 1)}, index=timestamps)
+    frame["aqi"] = calculate_aqi_list(frame["pm25"].to_numpy())
+
+    if resolution == "day":
+        frame = frame.resample("D").agg(
+            pm25=("pm25", "mean"),
+            pm25_min=("pm25", "min"),
+            pm25_max=("pm25", "max"),
+            aqi=("aqi", "mean"),
+            aqi_max=("aqi", "max"),
+            samples=("pm25", "size")
+        )
+        frame = frame.assign(pm25=frame["pm25"].round(1), aqi=frame["aqi"].round().astype(int))
+    elif resolution == "hour":
+        frame = frame.assign(pm25_min=frame["pm25"], pm25_max=frame["pm25"], aqi_max=frame["aqi"], samples=1)
+    if cursor is not None:
+        frame = frame[frame.index >= cursor + BUCKET_WIDTHS.get(resolution, timedelta(microseconds=1))]
+
+    page = frame.iloc[:limit]
+    data = [
+        {"timestamp": timestamp.isoformat(), **row}
+        for timestamp, row in zip(page.index, page.to_dict("records"))
+    ]
     
     return {
         "station_id": station_id,
-        "data": data
+        "resolution": resolution,
+        "data": data,
+        "next_cursor": page.index[-1].isoformat() if len(frame) > limit else None,
+        "source": "sample"
     }
-
-def calculate_aqi_from_pm25(pm25):
-    """Convert PM2.5 concentration to AQI"""
-    if pm25 <= 12:
-        return int((pm25 / 12) * 50)
-    elif pm25 <= 35.4:
-        return int(((pm25 - 12.1) / (35.4 - 12.1)) * 50 + 51)
-    elif pm25 <= 55.4:
-        return int(((pm25 - 35.5) / (55.4 - 35.5)) * 50 + 101)
-    elif pm25 <= 150.4:
-        return int(((pm25 - 55.5) / (150.4 - 55.5)) * 100 + 151)
-    elif pm25 <= 250.4:
-        return int(((pm25 - 150.5) / (250.4 - 150.5)) * 100 + 201)
-    else:
-        return int(((pm25 - 250.5) / (350.4 - 250.5)) * 100 + 301)
\ No newline at end of file
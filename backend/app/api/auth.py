@@ -1,14 +1,20 @@
 from datetime import datetime, timedelta
+import time
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 from pydantic import BaseModel
 
 from app.core.config import settings
-from app.db.session import get_db
-from app.db.models import User
-from app.services.security import verify_password, create_access_token
+from app.db.session import get_async_db
+from app.db.models import User, UserProfile
+from app.services.security import (
+    verify_password_async, get_password_hash_async, HashPoolBusy,
+    create_access_token, token_claims, verified_token_cache, account_state_cache,
+    token_cache_key, revoke_token, is_token_revoked, profile_version
+)
 
 router = APIRouter()
 
@@ -20,37 +26,163 @@ class Token(BaseModel):
     user_id: str
     email: str
 
+class Message(BaseModel):
+    message: str
+
 class UserRegister(BaseModel):
     email: str
     password: str
     full_name: str = None
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+class Principal:
+    """
+    Authenticated caller, resolved from token claims or a single user/profile
+    lookup. Handlers that need the ORM rows still query them explicitly.
+    """
+    __slots__ = ("id", "email", "full_name", "is_active", "profile_id", "alert_threshold", "profile_version", "exp", "jti")
+
+    def __init__(self, id, email, full_name, is_active, profile_id, alert_threshold, profile_version, exp, jti=None):
+        self.id = id
+        self.email = email
+        self.full_name = full_name
+        self.is_active = is_active
+        self.profile_id = profile_id
+        self.alert_threshold = alert_threshold
+        self.profile_version = profile_version
+        self.exp = exp
+        self.jti = jti
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _server_busy_exception():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many authentication requests, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+def decode_token(token: str):
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise credentials_exception
-    return user
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    if payload.get("jti") and is_token_revoked(payload["jti"]):
+        raise _credentials_exception()
+    return payload
+
+def _principal_from_claims(payload):
+    if "tv" not in payload or payload["tv"] != profile_version(payload["sub"]):
+        return None
+    return Principal(
+        id=payload["sub"],
+        email=payload.get("email"),
+        full_name=payload.get("name"),
+        is_active=payload.get("act", True),
+        profile_id=payload.get("pid"),
+        alert_threshold=payload.get("thr"),
+        profile_version=payload["tv"],
+        exp=payload["exp"],
+        jti=payload.get("jti")
+    )
+
+async def _principal_from_db(payload, db: AsyncSession):
+    # One roundtrip for both the user and their profile
+    row = (await db.execute(
+        select(User, UserProfile)
+        .outerjoin(UserProfile, UserProfile.user_id == User.id)
+        .where(User.id == payload["sub"])
+        .limit(1)
+    )).first()
+    if row is None:
+        return None
+    user, profile = row
+    principal = Principal(
+        id=user.id,
+        email=user.email,
+        full_name=user.full_name,
+        is_active=user.is_active if user.is_active is not None else True,
+        profile_id=profile.id if profile else None,
+        alert_threshold=profile.alert_threshold if profile else None,
+        profile_version=profile_version(user.id),
+        exp=payload["exp"],
+        jti=payload.get("jti")
+    )
+    account_state_cache.set(user.id, (principal.is_active, principal.profile_id, principal.alert_threshold))
+    return principal
+
+async def _account_state(user_id, db: AsyncSession):
+    """(is_active, profile_id, alert_threshold), re-read at most every AUTH_ACCOUNT_RECHECK_SECONDS"""
+    state = account_state_cache.get(user_id)
+    if state is None:
+        row = (await db.execute(
+            select(User.is_active, UserProfile.id, UserProfile.alert_threshold)
+            .outerjoin(UserProfile, UserProfile.user_id == User.id)
+            .where(User.id == user_id)
+            .limit(1)
+        )).first()
+        state = (False, None, None) if row is None else (row[0] is not False, row[1], row[2])
+        account_state_cache.set(user_id, state)
+    return state
+
+async def user_from_token(token: str, db: AsyncSession):
+    """
+    Resolve a bearer token to a Principal.
+
+    Verified tokens are cached by hash until they expire, so repeat requests
+    skip JWT verification. With AUTH_EMBED_CLAIMS a first sighting is also
+    served from the token's claims; otherwise it costs one user/profile
+    query. Either way the active flag and profile are refreshed from the
+    database every AUTH_ACCOUNT_RECHECK_SECONDS, so changes made through
+    another worker are picked up.
+    """
+    key = token_cache_key(token)
+    principal = verified_token_cache.get(key)
+    if principal is not None and not (
+        principal.exp > time.time()
+        and not (principal.jti and is_token_revoked(principal.jti))
+        and principal.profile_version == profile_version(principal.id)
+    ):
+        verified_token_cache.invalidate(key)
+        principal = None
+
+    if principal is None:
+        payload = decode_token(token)
+        principal = _principal_from_claims(payload) or await _principal_from_db(payload, db)
+        if principal is None or not principal.is_active:
+            raise _credentials_exception()
+        verified_token_cache.set(key, principal)
+
+    principal.is_active, principal.profile_id, principal.alert_threshold = await _account_state(principal.id, db)
+    if not principal.is_active:
+        verified_token_cache.invalidate(key)
+        raise _credentials_exception()
+    return principal
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    return await user_from_token(token, db)
+
+@router.post("/logout", response_model=Message)
+async def logout(token: str = Depends(oauth2_scheme)):
+    payload = decode_token(token)
+    if payload.get("jti"):
+        revoke_token(payload["jti"], payload["exp"])
+    verified_token_cache.invalidate(token_cache_key(token))
+    return {"message": "Logged out"}
 
 @router.post("/register", response_model=Token)
 async def register_user(
     user_data: UserRegister,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user_data.email).limit(1))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -58,8 +190,10 @@ async def register_user(
         )
     
     # Create new user
-    from app.services.security import get_password_hash
-    hashed_password = get_password_hash(user_data.password)
+    try:
+        hashed_password = await get_password_hash_async(user_data.password)
+    except HashPoolBusy:
+        raise _server_busy_exception()
     user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -67,11 +201,11 @@ async def register_user(
     )
     
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     # Create access token
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_access_token(data=token_claims(user))
     
     return {
         "access_token": access_token,
@@ -83,17 +217,26 @@ async def register_user(
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await db.scalar(select(User).where(User.email == form_data.username).limit(1))
+    try:
+        password_ok = user is not None and await verify_password_async(
+            form_data.password, user.hashed_password
+        )
+    except HashPoolBusy:
+        raise _server_busy_exception()
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = create_access_token(data={"sub": user.id})
+    profile = None
+    if settings.AUTH_EMBED_CLAIMS:
+        profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == user.id).limit(1))
+    access_token = create_access_token(data=token_claims(user, profile))
     return {
         "access_token": access_token,
         "token_type": "bearer",
@@ -0,0 +1,69 @@
+import hashlib
+import uuid
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import timezone
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+from app.services.cache import TTLCache
+from app.services.serialization import encode_body
+
+# Versions are per-process counters, so tags from another process or an
+# earlier run must never match
+_process_id = uuid.uuid4().hex
+
+# Serialized response bodies keyed by ETag
+response_cache = TTLCache(
+    "responses",
+    settings.RESPONSE_CACHE_TTL_SECONDS,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES
+)
+
+def make_etag(request, version):
+    """Strong ETag for a route's response at a data version, per path and query"""
+    key = "|".join((_process_id, request.url.path, str(sorted(request.query_params.multi_items())), repr(version)))
+    return '"' + hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + '"'
+
+def is_not_modified(request, etag, last_modified=None):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+async def cached_response(request: Request, version, build, last_modified=None, model=None):
+    """
+    Serve build()'s payload with validators for the given data version.
+
+    A matching If-None-Match (or If-Modified-Since) is answered with 304
+    before build runs, and the encoded body is kept so repeat requests for
+    the same version skip the handler and JSON encoding entirely. model is
+    the route's response model, which a raw Response bypasses. Only use
+    this where the payload is fully determined by the path, query string
+    and version.
+    """
+    etag = make_etag(request, version)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.RESPONSE_MAX_AGE_SECONDS}, must-revalidate"
+    }
+    if last_modified is not None:
+        last_modified = last_modified.replace(tzinfo=last_modified.tzinfo or timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    body = response_cache.get(etag)
+    if body is None:
+        body = encode_body(await build(), model)
+        response_cache.set(etag, body)
+    return Response(body, media_type="application/json", headers=headers)
@@ -1,28 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
-from app.services.forecast import get_pm25_forecast
+from app.api.caching import cached_response
+from app.core.config import settings
+from app.db.session import get_async_read_db
+from app.services.forecast import batch_forecast, get_forecast_version, get_pm25_forecast
 
 router = APIRouter()
 
-@router.get("/")
+class ForecastPoint(BaseModel):
+    timestamp: str
+    pm25: float
+    confidence_lower: float
+    confidence_upper: float
+    aqi: int | None = None
+
+class Forecast(BaseModel):
+    city: str
+    forecast_hours: int
+    forecast: list[ForecastPoint]
+    source: str
+    generated_at: str
+
+class ForecastBatchRequest(BaseModel):
+    cities: list[str] = []
+    station_ids: list[str] = []
+    hours: int = 48
+
+class ForecastBatch(BaseModel):
+    """Columnar: value arrays are indexed [series][hour]"""
+    start: str
+    hours: int
+    timestamps: list[str]
+    cities: list[str]
+    station_ids: list[str | None]
+    sources: list[str]
+    pm25: list[list[float]]
+    confidence_lower: list[list[float]]
+    confidence_upper: list[list[float]]
+    aqi: list[list[int]]
+    unknown_station_ids: list[str]
+    generated_at: str
+
+@router.get("/", response_model=Forecast)
 async def get_forecast(
+    request: Request,
     city: str,
     hours: int = 48,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    if hours > 168:  # Limit to one week
-        raise HTTPException(status_code=400, detail="Hours cannot exceed 168 (1 week)")
+    if hours < 1 or hours > 168:  # Limit to one week
+        raise HTTPException(status_code=400, detail="Hours must be between 1 and 168")
     
     if not city:
         raise HTTPException(status_code=400, detail="City parameter is required")
     
+    async def build():
+        try:
+            return await get_pm25_forecast(city, hours, db)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, 
+                detail=f"Forecast generation failed: {str(e)}"
+            )
+
+    return await cached_response(
+        request, ("forecast", get_forecast_version(), settings.FORECAST_SOURCE), build, model=Forecast
+    )
+
+@router.post("/batch", response_model=ForecastBatch)
+async def get_forecast_batch(
+    batch: ForecastBatchRequest,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Forecasts for several cities and/or stations from one model pass,
+    instead of one /api/forecast/ call per city
+    """
+    if batch.hours < 1 or batch.hours > 168:
+        raise HTTPException(status_code=400, detail="Hours must be between 1 and 168")
+    requested = len(batch.cities) + len(batch.station_ids)
+    if requested == 0:
+        raise HTTPException(status_code=400, detail="Give at least one city or station_id")
+    if requested > settings.FORECAST_BATCH_MAX_SERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.FORECAST_BATCH_MAX_SERIES} cities and stations per batch"
+        )
+
     try:
-        forecast_data = await get_pm25_forecast(city, hours)
-        return forecast_data
+        return await db.run_sync(batch_forecast, batch.cities, batch.station_ids, batch.hours)
     except Exception as e:
         raise HTTPException(
-            status_code=500, 
+            status_code=500,
             detail=f"Forecast generation failed: {str(e)}"
-        )
\ No newline at end of file
+        )
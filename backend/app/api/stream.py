@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.api.auth import user_from_token
+from app.services.notifier import broker
+
+router = APIRouter()
+
+def format_event(event_type, data):
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def event_stream(request: Request, subscription):
+    try:
+        # Tell EventSource how long to wait before reconnecting
+        yield "retry: 5000\n\n"
+        while not await request.is_disconnected():
+            if subscription.needs_resync:
+                subscription.needs_resync = False
+                yield format_event("resync", {"dropped": subscription.dropped})
+            try:
+                event_type, data = await asyncio.wait_for(
+                    subscription.queue.get(),
+                    timeout=settings.STREAM_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_event(event_type, data)
+    finally:
+        broker.unsubscribe(subscription)
+
+@router.get("/events")
+async def stream_events(request: Request, token: str):
+    """
+    Server-Sent Events feed of the caller's new alerts and AQI changes.
+    EventSource can't send headers, so the JWT comes as a query parameter.
+    """
+    # Authenticate with a short-lived session rather than holding one open
+    # for the lifetime of the stream
+    async with AsyncSessionLocal() as db:
+        user = await user_from_token(token, db)
+
+    subscription = broker.subscribe(user.id)
+    if subscription is None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many open event streams"
+        )
+
+    return StreamingResponse(
+        event_stream(request, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict
 
-from app.db.session import get_db
-from app.db.models import User, UserProfile
-from app.api.auth import get_current_user
+from app.db.session import get_async_db, get_async_read_db
+from app.db.models import UserProfile
+from app.api.auth import Principal, get_current_user
+from app.services.security import bump_profile_version
 
 router = APIRouter()
 
@@ -14,25 +17,58 @@ class UserProfileUpdate(BaseModel):
     is_smoker: bool = False
     daily_outdoor_hours: int = 0
 
-@router.get("/profile")
+class UserOut(BaseModel):
+    email: str
+    full_name: str | None = None
+
+class ProfileOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    user_id: str
+    age: int | None = None
+    has_chronic_conditions: bool | None = None
+    is_smoker: bool | None = None
+    daily_outdoor_hours: int | None = None
+    risk_score: int | None = None
+    risk_category: str | None = None
+    advice: str | None = None
+    alert_threshold: int | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+class UserProfileOut(BaseModel):
+    user: UserOut
+    profile: ProfileOut | None = None
+
+class RiskAssessment(BaseModel):
+    score: int
+    category: str
+    advice: str
+
+class ProfileUpdated(BaseModel):
+    message: str
+    risk_assessment: RiskAssessment
+
+@router.get("/profile", response_model=UserProfileOut)
 async def get_user_profile(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
+    profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == current_user.id).limit(1))
     return {
         "user": {
             "email": current_user.email,
             "full_name": current_user.full_name
         },
-        "profile": profile.__dict__ if profile else None
+        "profile": profile
     }
 
-@router.post("/profile")
+@router.post("/profile", response_model=ProfileUpdated)
 async def update_user_profile(
     profile_data: UserProfileUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     from app.services.risk import calculate_risk_score
     
@@ -45,7 +81,7 @@ async def update_user_profile(
     )
     
     # Update or create profile
-    profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
+    profile = await db.scalar(select(UserProfile).where(UserProfile.user_id == current_user.id).limit(1))
     if profile:
         profile.age = profile_data.age
         profile.has_chronic_conditions = profile_data.has_chronic_conditions
@@ -67,7 +103,8 @@ async def update_user_profile(
         )
         db.add(profile)
     
-    db.commit()
-    db.refresh(profile)
+    await db.commit()
+    await db.refresh(profile)
+    bump_profile_version(current_user.id)
     
     return {"message": "Profile updated successfully", "risk_assessment": risk_data}
\ No newline at end of file
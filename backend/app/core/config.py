@@ -5,13 +5,124 @@ load_dotenv()
 
 class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./cleanairpk.db")
+    # Optional read replica for GET endpoints; defaults to DATABASE_URL
+    DATABASE_READ_URL: str = os.getenv("DATABASE_READ_URL", "")
+
+    # Connection pool (ignored for SQLite)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT_SECONDS: int = int(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+    # SQLite tuning
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    # Embed active flag, profile id and alert threshold in tokens so
+    # authenticated requests can skip the users table (but for the
+    # periodic account recheck below)
+    AUTH_EMBED_CLAIMS: bool = os.getenv("AUTH_EMBED_CLAIMS", "false").lower() == "true"
+    AUTH_TOKEN_CACHE_SECONDS: int = int(os.getenv("AUTH_TOKEN_CACHE_SECONDS", "300"))
+    AUTH_TOKEN_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_TOKEN_CACHE_MAX_ENTRIES", "10000"))
+    # Longest a deactivation or profile change made through another worker
+    # can go unnoticed; each user's account state is re-read this often
+    AUTH_ACCOUNT_RECHECK_SECONDS: int = int(os.getenv("AUTH_ACCOUNT_RECHECK_SECONDS", "30"))
+    AUTH_PROFILE_VERSIONS_MAX_ENTRIES: int = int(os.getenv("AUTH_PROFILE_VERSIONS_MAX_ENTRIES", "100000"))
+
+    # Password hashing worker pool: "process" or "thread"
+    PASSWORD_HASH_EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "process")
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
     
     # External APIs
     OPENA_API_KEY: str = os.getenv("OPENA_API_KEY", "")
     IQAIR_API_KEY: str = os.getenv("IQAIR_API_KEY", "")
     USE_SAMPLE_DATA: bool = os.getenv("USE_SAMPLE_DATA", "false").lower() == "true"
+    OPENAQ_BASE_URL: str = os.getenv("OPENAQ_BASE_URL", "https://api.openaq.org/v2")
+
+    # Outbound HTTP client
+    HTTP_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "3"))
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+    HTTP_MAX_CONCURRENCY_PER_HOST: int = int(os.getenv("HTTP_MAX_CONCURRENCY_PER_HOST", "5"))
+
+    # Current AQI snapshot cache
+    AQI_CACHE_TTL_SECONDS: int = int(os.getenv("AQI_CACHE_TTL_SECONDS", "60"))
+    AQI_CACHE_STALE_SECONDS: int = int(os.getenv("AQI_CACHE_STALE_SECONDS", "300"))
+    AQI_CACHE_MAX_ENTRIES: int = int(os.getenv("AQI_CACHE_MAX_ENTRIES", "256"))
+    AQI_CACHE_COORD_PRECISION: int = int(os.getenv("AQI_CACHE_COORD_PRECISION", "1"))
+
+    # Conditional GETs and serialized response bodies for current, stations and forecast
+    RESPONSE_MAX_AGE_SECONDS: int = int(os.getenv("RESPONSE_MAX_AGE_SECONDS", "60"))
+    RESPONSE_CACHE_TTL_SECONDS: int = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+
+    # Forecasts
+    FORECAST_CACHE_MAX_ENTRIES: int = int(os.getenv("FORECAST_CACHE_MAX_ENTRIES", "512"))
+    # "precomputed" serves from the forecasts table, "on_demand" always recomputes
+    FORECAST_SOURCE: str = os.getenv("FORECAST_SOURCE", "precomputed")
+    FORECAST_PRECOMPUTE_ENABLED: bool = os.getenv("FORECAST_PRECOMPUTE_ENABLED", "true").lower() == "true"
+    FORECAST_PRECOMPUTE_HOURS: int = int(os.getenv("FORECAST_PRECOMPUTE_HOURS", "168"))
+    # Serialized model artifact (see scripts/train_forecast_model.py); empty uses the simple model
+    FORECAST_MODEL_PATH: str = os.getenv("FORECAST_MODEL_PATH", "")
+    FORECAST_BATCH_MAX_SERIES: int = int(os.getenv("FORECAST_BATCH_MAX_SERIES", "200"))
+
+    # Alerts
+    ALERT_DEDUP_WINDOW_HOURS: int = int(os.getenv("ALERT_DEDUP_WINDOW_HOURS", "6"))
+
+    # Server-Sent Events push channel
+    STREAM_QUEUE_SIZE: int = int(os.getenv("STREAM_QUEUE_SIZE", "100"))
+    STREAM_MAX_CONNECTIONS_PER_USER: int = int(os.getenv("STREAM_MAX_CONNECTIONS_PER_USER", "5"))
+    STREAM_KEEPALIVE_SECONDS: int = int(os.getenv("STREAM_KEEPALIVE_SECONDS", "15"))
+    # Alerts inserted by other workers reach this worker's streams by polling
+    STREAM_ALERT_POLL_SECONDS: int = int(os.getenv("STREAM_ALERT_POLL_SECONDS", "5"))
+    # How far back each poll looks, covering commit lag and clock skew between workers
+    STREAM_ALERT_LOOKBACK_SECONDS: int = int(os.getenv("STREAM_ALERT_LOOKBACK_SECONDS", "120"))
+
+    # Measurement storage: "legacy" (UUID-keyed measurements table) or
+    # "compact" (measurement_readings keyed on station and time)
+    MEASUREMENT_STORAGE: str = os.getenv("MEASUREMENT_STORAGE", "legacy")
+    # Raw readings older than this are rolled up into daily aggregates; 0 keeps them forever
+    MEASUREMENT_RAW_RETENTION_DAYS: int = int(os.getenv("MEASUREMENT_RAW_RETENTION_DAYS", "0"))
+    # Monthly Postgres partitions created ahead of the current month
+    MEASUREMENT_PARTITIONS_AHEAD: int = int(os.getenv("MEASUREMENT_PARTITIONS_AHEAD", "2"))
+    MEASUREMENT_MAINTENANCE_ENABLED: bool = os.getenv("MEASUREMENT_MAINTENANCE_ENABLED", "true").lower() == "true"
+    MEASUREMENT_MAINTENANCE_INTERVAL_SECONDS: int = int(os.getenv("MEASUREMENT_MAINTENANCE_INTERVAL_SECONDS", "3600"))
+
+    # Rows fetched and encoded per chunk by /api/aqi/export
+    EXPORT_BATCH_ROWS: int = int(os.getenv("EXPORT_BATCH_ROWS", "50000"))
+
+    # Nearest-station lookups and inverse-distance interpolation
+    SPATIAL_INDEX_CELL_DEGREES: float = float(os.getenv("SPATIAL_INDEX_CELL_DEGREES", "0.5"))
+    SPATIAL_INDEX_TTL_SECONDS: int = int(os.getenv("SPATIAL_INDEX_TTL_SECONDS", "300"))
+    IDW_NEIGHBORS: int = int(os.getenv("IDW_NEIGHBORS", "8"))
+    IDW_POWER: float = float(os.getenv("IDW_POWER", "2"))
+
+    # Interpolated AQI map tiles
+    TILE_GRID_DEGREES: float = float(os.getenv("TILE_GRID_DEGREES", "0.05"))
+    TILE_IDW_RADIUS_KM: float = float(os.getenv("TILE_IDW_RADIUS_KM", "150"))
+    TILE_MAX_ZOOM: int = int(os.getenv("TILE_MAX_ZOOM", "12"))
+    TILE_CACHE_TTL_SECONDS: int = int(os.getenv("TILE_CACHE_TTL_SECONDS", "86400"))
+    TILE_CACHE_MAX_ENTRIES: int = int(os.getenv("TILE_CACHE_MAX_ENTRIES", "2048"))
+    TILE_MAX_AGE_SECONDS: int = int(os.getenv("TILE_MAX_AGE_SECONDS", "300"))
+    # Blank tiles served while there are no readings yet
+    TILE_EMPTY_MAX_AGE_SECONDS: int = int(os.getenv("TILE_EMPTY_MAX_AGE_SECONDS", "15"))
+
+    # Instrumentation: Prometheus /metrics and sampled stacks of slow requests
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # Requests slower than this get their sampled stacks written out; 0 disables the profiler
+    PROFILE_SLOW_REQUEST_MS: int = int(os.getenv("PROFILE_SLOW_REQUEST_MS", "0"))
+    PROFILE_SAMPLE_INTERVAL_MS: int = int(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+    PROFILE_OUTPUT_DIR: str = os.getenv("PROFILE_OUTPUT_DIR", "./profiles")
+
+    # Background ingestion
+    INGESTION_ENABLED: bool = os.getenv("INGESTION_ENABLED", "true").lower() == "true"
+    INGESTION_INTERVAL_SECONDS: int = int(os.getenv("INGESTION_INTERVAL_SECONDS", "900"))
 
 settings = Settings()
\ No newline at end of file
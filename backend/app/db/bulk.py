@@ -0,0 +1,39 @@
+from itertools import islice
+
+from sqlalchemy import func
+
+def dialect_insert(bind, table):
+    """
+    INSERT construct for the bind's dialect, so callers can use
+    on_conflict_do_update / on_conflict_do_nothing on SQLite and Postgres
+    """
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+def chunked(rows, size):
+    """Yield lists of at most size rows from any iterable"""
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+# Merge helpers for ON CONFLICT DO UPDATE on aggregate rows. NULL means
+# "no readings", so it never wins a comparison or poisons a sum.
+def sql_add(a, b):
+    return func.coalesce(a, 0) + func.coalesce(b, 0)
+
+def sql_least(bind, a, b):
+    if bind.dialect.name == "postgresql":
+        return func.least(a, b)
+    # SQLite's multi-argument min() is NULL if either side is
+    return func.min(func.coalesce(a, b), func.coalesce(b, a))
+
+def sql_greatest(bind, a, b):
+    if bind.dialect.name == "postgresql":
+        return func.greatest(a, b)
+    return func.max(func.coalesce(a, b), func.coalesce(b, a))
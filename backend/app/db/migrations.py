@@ -0,0 +1,121 @@
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from app.core.config import settings
+from app.db.models import Base, MeasurementReading
+from app.db.storage import add_months, ensure_partitions, month_start
+
+def _create_missing_tables(conn):
+    Base.metadata.create_all(bind=conn)
+
+def _add_measurement_indexes(conn):
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_measurements_station_measured_at "
+        "ON measurements (station_id, measured_at)"
+    ))
+
+def _add_forecast_indexes(conn):
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_forecasts_station_forecasted_for "
+        "ON forecasts (station_id, forecasted_for)"
+    ))
+
+def _add_column(conn, table, column, ddl_type):
+    """Add a column if it's missing; True when it was added"""
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column in existing:
+        return False
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+    return True
+
+def _add_alert_dedup_key(conn):
+    _add_column(conn, "alerts", "dedup_key", "VARCHAR")
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_alerts_dedup_key ON alerts (dedup_key)"
+    ))
+
+_THRESHOLD_ALERT_PREFIX = "High AQI Alert for "
+
+def _backfill_alert_kinds(conn):
+    """
+    Tag alerts written before kind and city existed from their message
+    text, in place. Messages matching neither kind keep a NULL kind.
+    """
+    find = "strpos" if conn.dialect.name == "postgresql" else "instr"
+    city_start = f"{find}(message, :prefix) + {len(_THRESHOLD_ALERT_PREFIX)}"
+    conn.execute(text(
+        f"UPDATE alerts SET kind = 'aqi_threshold', "
+        f"city = substr(message, {city_start}, {find}(message, ': ') - ({city_start})) "
+        f"WHERE kind IS NULL AND message LIKE :pattern"
+    ), {"prefix": _THRESHOLD_ALERT_PREFIX, "pattern": f"%{_THRESHOLD_ALERT_PREFIX}%: % AQI%"})
+    conn.execute(text(
+        "UPDATE alerts SET kind = 'threshold_changed' "
+        "WHERE kind IS NULL AND message LIKE 'Alert threshold set to%'"
+    ))
+
+def _add_alert_structured_columns(conn):
+    kind_added = _add_column(conn, "alerts", "kind", "VARCHAR")
+    _add_column(conn, "alerts", "city", "VARCHAR")
+    _add_column(conn, "alerts", "station_id", "VARCHAR")
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_alerts_user_created_at "
+        "ON alerts (user_id, created_at)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_alerts_user_city_created_at "
+        "ON alerts (user_id, city, created_at)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_alerts_user_read_created_at "
+        "ON alerts (user_id, is_read, created_at)"
+    ))
+    # Only rows that predate the column need tagging, so this runs once,
+    # in the same transaction that adds it
+    if kind_added:
+        _backfill_alert_kinds(conn)
+
+def _create_measurement_partitions(conn):
+    # The compact table is partitioned on Postgres and rejects rows that
+    # have no partition to go to
+    current = month_start(datetime.utcnow())
+    ensure_partitions(
+        conn, current, add_months(current, settings.MEASUREMENT_PARTITIONS_AHEAD),
+        MeasurementReading.__table__
+    )
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+def _copy_legacy_measurements(conn):
+    # The first time compact storage is enabled, seed it from the legacy
+    # table; duplicate (station, time) readings are averaged into one row
+    if settings.MEASUREMENT_STORAGE != "compact":
+        return
+    if conn.execute(text("SELECT 1 FROM measurement_readings LIMIT 1")).first():
+        return
+    first, last = conn.execute(text("SELECT MIN(measured_at), MAX(measured_at) FROM measurements")).one()
+    if first is None:
+        return
+    ensure_partitions(conn, _parse_datetime(first), _parse_datetime(last), MeasurementReading.__table__)
+    conn.execute(text(
+        "INSERT INTO measurement_readings (station_id, measured_at, pm25, pm10, aqi) "
+        "SELECT station_id, measured_at, AVG(pm25), AVG(pm10), MAX(aqi) FROM measurements "
+        "WHERE measured_at IS NOT NULL GROUP BY station_id, measured_at"
+    ))
+
+# Applied in order on every startup, so each step must be idempotent
+MIGRATIONS = [
+    _create_missing_tables,
+    _add_measurement_indexes,
+    _add_forecast_indexes,
+    _add_alert_dedup_key,
+    _add_alert_structured_columns,
+    _create_measurement_partitions,
+    _copy_legacy_measurements,
+]
+
+def run_migrations(engine):
+    with engine.begin() as conn:
+        for migration in MIGRATIONS:
+            migration(conn)
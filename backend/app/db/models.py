@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, BigInteger, Integer, SmallInteger, String, Float, DateTime, Boolean, Text, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -65,6 +65,51 @@ class Measurement(Base):
     
     station = relationship("Station", back_populates="measurements")
 
+    __table_args__ = (
+        Index("ix_measurements_station_measured_at", "station_id", "measured_at"),
+    )
+
+class MeasurementReading(Base):
+    """
+    Compact measurement storage (MEASUREMENT_STORAGE=compact). The primary
+    key is the (station_id, measured_at) pair itself, so there is no UUID
+    column or separate index: rows are clustered by station and time on
+    SQLite (WITHOUT ROWID) and range-partitioned by month on Postgres.
+    """
+    __tablename__ = "measurement_readings"
+
+    station_id = Column(String, ForeignKey("stations.id"), primary_key=True)
+    measured_at = Column(DateTime, primary_key=True)
+    pm25 = Column(Float)
+    pm10 = Column(Float)
+    aqi = Column(SmallInteger)
+
+    __table_args__ = {
+        "sqlite_with_rowid": False,
+        "postgresql_partition_by": "RANGE (measured_at)",
+    }
+
+class MeasurementDaily(Base):
+    """
+    Daily aggregates of raw readings older than MEASUREMENT_RAW_RETENTION_DAYS.
+    Sums and counts rather than means so late rows can be merged in.
+    """
+    __tablename__ = "measurement_daily"
+
+    station_id = Column(String, ForeignKey("stations.id"), primary_key=True)
+    day = Column(DateTime, primary_key=True)
+    samples = Column(Integer, nullable=False)
+    pm25_count = Column(Integer, nullable=False)
+    pm25_sum = Column(Float)
+    pm25_min = Column(Float)
+    pm25_max = Column(Float)
+    pm10_count = Column(Integer, nullable=False)
+    pm10_sum = Column(Float)
+    aqi_sum = Column(Float)
+    aqi_max = Column(Integer)
+
+    __table_args__ = {"sqlite_with_rowid": False}
+
 class Forecast(Base):
     __tablename__ = "forecasts"
     
@@ -78,6 +123,10 @@ class Forecast(Base):
     
     station = relationship("Station", back_populates="forecasts")
 
+    __table_args__ = (
+        Index("ix_forecasts_station_forecasted_for", "station_id", "forecasted_for", unique=True),
+    )
+
 class Alert(Base):
     __tablename__ = "alerts"
     
@@ -86,6 +135,64 @@ class Alert(Base):
     message = Column(String, nullable=False)
     aqi_level = Column(Integer)
     is_read = Column(Boolean, default=False)
+    # "aqi_threshold" or "threshold_changed"; NULL for old alerts whose
+    # message matched neither when the column was added
+    kind = Column(String)
+    city = Column(String)
+    station_id = Column(String)
+    # "<window>:<user_id>:<city>" for threshold alerts, so evaluators racing
+    # on one snapshot can't insert the same alert twice. The spacing between
+    # a user's alerts for a city is checked against created_at.
+    dedup_key = Column(String, unique=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    user = relationship("User", back_populates="alerts")
\ No newline at end of file
+    user = relationship("User", back_populates="alerts")
+
+    __table_args__ = (
+        Index("ix_alerts_user_created_at", "user_id", "created_at"),
+        Index("ix_alerts_user_city_created_at", "user_id", "city", "created_at"),
+        Index("ix_alerts_user_read_created_at", "user_id", "is_read", "created_at"),
+    )
+
+class AqiRollup(Base):
+    """
+    Hourly, daily and monthly AQI statistics per station and per city,
+    maintained incrementally as readings are ingested. Each row is one
+    (scope, scope_id, period, bucket); counts and sums let means be derived
+    and new readings be added without rescanning raw data.
+    """
+    __tablename__ = "aqi_rollups"
+
+    # Key order serves both "one series" and "every series of a scope" scans.
+    # scope is "station" or "city", period is "hour", "day" or "month",
+    # scope_id is the station id or city name and bucket the period's start.
+    scope = Column(String, primary_key=True)
+    period = Column(String, primary_key=True)
+    scope_id = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    samples = Column(Integer, nullable=False)
+    pm25_count = Column(Integer, nullable=False)
+    pm25_sum = Column(Float)
+    pm25_max = Column(Float)
+    aqi_count = Column(Integer, nullable=False)
+    aqi_sum = Column(Float)
+    aqi_max = Column(Integer)
+    # Readings above AQI 100 (unhealthy for sensitive groups), 150 and 200
+    over_100 = Column(Integer, nullable=False)
+    over_150 = Column(Integer, nullable=False)
+    over_200 = Column(Integer, nullable=False)
+
+    __table_args__ = {"sqlite_with_rowid": False}
+
+class BackfillCheckpoint(Base):
+    """
+    Progress of scripts/backfill_measurements.py per source, written in the
+    same transaction as each batch so a resume never replays one
+    """
+    __tablename__ = "backfill_checkpoints"
+
+    source = Column(String, primary_key=True)
+    source_size = Column(BigInteger, nullable=False)
+    rows_done = Column(BigInteger, nullable=False)
+    measurements = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,16 +1,116 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.services.metrics import instrument_engine
+
+def _is_sqlite(url):
+    return url.startswith("sqlite")
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed during writes; busy_timeout makes concurrent
+    # writers wait for the lock instead of failing with "database is locked"
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+def create_db_engine(url):
+    """Engine configured from Settings: pool sizing for servers, pragmas for SQLite"""
+    if _is_sqlite(url):
+        db_engine = create_engine(
+            url,
+            connect_args={
+                "check_same_thread": False,
+                "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+            }
+        )
+        event.listen(db_engine, "connect", _apply_sqlite_pragmas)
+        return instrument_engine(db_engine)
+
+    return instrument_engine(create_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING
+    ))
+
+def async_database_url(url):
+    """Same database through an asyncio driver: aiosqlite or asyncpg"""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+def create_async_db_engine(url):
+    """Async counterpart of create_db_engine with the same pool and pragma settings"""
+    url = async_database_url(url)
+    if _is_sqlite(url):
+        db_engine = create_async_engine(
+            url,
+            connect_args={"timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000}
+        )
+        # Pool events are registered on the underlying sync engine
+        event.listen(db_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        instrument_engine(db_engine.sync_engine)
+        return db_engine
+
+    db_engine = create_async_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING
+    )
+    instrument_engine(db_engine.sync_engine)
+    return db_engine
+
+engine = create_db_engine(settings.DATABASE_URL)
+# GET endpoints read from a replica when one is configured
+read_engine = create_db_engine(settings.DATABASE_READ_URL) if settings.DATABASE_READ_URL else engine
 
-engine = create_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
+# Request handlers use the async engines so a slow query doesn't block the
+# event loop; background jobs and scripts keep the sync ones above
+async_engine = create_async_db_engine(settings.DATABASE_URL)
+async_read_engine = (
+    create_async_db_engine(settings.DATABASE_READ_URL) if settings.DATABASE_READ_URL else async_engine
+)
+
+# expire_on_commit=False: attributes can't lazy-load after a commit in async code
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import insert, text
+
+from app.core.config import settings
+from app.db.bulk import chunked, dialect_insert
+from app.db.models import Measurement, MeasurementReading
+
+STORAGE_TABLES = {
+    "legacy": Measurement.__table__,
+    "compact": MeasurementReading.__table__,
+}
+
+def measurement_table(storage=None):
+    """Table raw readings are written to and read from (MEASUREMENT_STORAGE)"""
+    return STORAGE_TABLES[storage or settings.MEASUREMENT_STORAGE]
+
+def measurement_insert(bind, table=None):
+    """
+    INSERT for raw readings. The compact table's key is (station_id,
+    measured_at), so a reading that is already stored is skipped.
+    """
+    table = measurement_table() if table is None else table
+    if table is MeasurementReading.__table__:
+        return dialect_insert(bind, table).on_conflict_do_nothing(
+            index_elements=["station_id", "measured_at"]
+        )
+    return insert(table)
+
+# Columns of the stored rows that rollups are computed from
+STORED_COLUMNS = ("station_id", "measured_at", "pm25", "aqi")
+
+def store_measurements(conn, rows, table=None, chunk_size=5000):
+    """
+    Insert raw readings (a list of dicts) and return the ones actually
+    stored as a DataFrame of STORED_COLUMNS. Readings the compact table
+    already holds are skipped by ON CONFLICT and left out, so callers can
+    roll up exactly what was added.
+    """
+    table = measurement_table() if table is None else table
+    stmt = measurement_insert(conn, table)
+    if table is not MeasurementReading.__table__:
+        # Legacy rows have no natural key, so every row is inserted
+        for chunk in chunked(rows, chunk_size):
+            conn.execute(stmt, chunk)
+        return pd.DataFrame(rows, columns=list(STORED_COLUMNS))
+
+    stmt = stmt.returning(*(table.c[column] for column in STORED_COLUMNS))
+    stored = []
+    for chunk in chunked(rows, chunk_size):
+        stored.extend(conn.execute(stmt, chunk).all())
+    return pd.DataFrame(stored, columns=list(STORED_COLUMNS))
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def partition_name(month):
+    return f"{MeasurementReading.__tablename__}_{month:%Y_%m}"
+
+def is_partitioned(conn, table=None):
+    """Only the compact table on Postgres is split into monthly partitions"""
+    table = measurement_table() if table is None else table
+    return conn.dialect.name == "postgresql" and table is MeasurementReading.__table__
+
+def ensure_partitions(conn, start, end, table=None):
+    """Create the monthly partitions covering start..end; a no-op elsewhere"""
+    if not is_partitioned(conn, table):
+        return
+    month = month_start(start)
+    while month <= end:
+        following = add_months(month, 1)
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} "
+            f"PARTITION OF {MeasurementReading.__tablename__} "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{following:%Y-%m-%d}')"
+        ))
+        month = following
+
+def partitions_before(conn, cutoff):
+    """Names of monthly partitions that only hold readings older than cutoff"""
+    names = conn.scalars(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+        "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+        "WHERE parent.relname = :parent"
+    ), {"parent": MeasurementReading.__tablename__})
+    prefix = f"{MeasurementReading.__tablename__}_"
+    expired = []
+    for name in names:
+        try:
+            month = datetime.strptime(name[len(prefix):], "%Y_%m")
+        except ValueError:
+            continue
+        if add_months(month, 1) <= cutoff:
+            expired.append(name)
+    return sorted(expired)
@@ -1,13 +1,88 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 import os
+import time
 
 from app.core.config import settings
+from app.db.migrations import run_migrations
+from app.db.session import engine, async_engine, async_read_engine
+from app.services.alerting import alert_relay_task
+from app.services.http_client import close_http_client
+from app.services.metrics import RequestStats, current_request_stats, observe_request, render_metrics
+from app.services.profiler import profiler
+from app.services.forecast import forecast_precompute_task, load_configured_model
+from app.services.ingestion import ingestion_task
+from app.services.retention import measurement_maintenance_task
+from app.services.security import shutdown_hash_pool, start_hash_pool
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    run_migrations(engine)
+    load_configured_model()
+    start_hash_pool()
+    alert_relay_task.start()
+    if settings.INGESTION_ENABLED:
+        ingestion_task.start()
+    if settings.FORECAST_PRECOMPUTE_ENABLED:
+        forecast_precompute_task.start()
+    if settings.MEASUREMENT_MAINTENANCE_ENABLED:
+        measurement_maintenance_task.start()
+    yield
+    await measurement_maintenance_task.stop()
+    await forecast_precompute_task.stop()
+    await ingestion_task.stop()
+    await alert_relay_task.stop()
+    await close_http_client()
+    await async_read_engine.dispose()
+    await async_engine.dispose()
+    shutdown_hash_pool()
+
+class MetricsMiddleware:
+    """
+    Per-request latency, status and SQL counts labelled by route template,
+    plus the slow-request profiler when it's enabled. Plain ASGI so
+    streaming responses are timed to their last chunk.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        stats = RequestStats()
+        stats_token = current_request_stats.set(stats)
+        profile_token = profiler.start_request() if profiler.enabled else None
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request_stats.reset(stats_token)
+            # The router records the matched route in the scope; templates
+            # keep the label set bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            observe_request(scope["method"], route, status, elapsed, stats)
+            if profile_token is not None:
+                profiler.finish_request(profile_token, scope["method"], route, elapsed)
 
 app = FastAPI(
     title="CleanAirPK API",
     description="Air Quality Monitoring Backend",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -24,13 +99,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
-from app.api import auth, users, aqi, forecast, alerts
+from app.api import auth, users, aqi, forecast, alerts, stream
 app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(aqi.router, prefix="/api/aqi", tags=["air-quality"])
 app.include_router(forecast.router, prefix="/api/forecast", tags=["forecast"])
 app.include_router(alerts.router, prefix="/api/alerts", tags=["alerts"])
+app.include_router(stream.router, prefix="/api/stream", tags=["stream"])
 
 @app.get("/")
 async def root():
@@ -38,7 +117,27 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    from app.services.external_apis import aqi_cache
+    from app.services.tiles import tile_cache
+    from app.api.caching import response_cache
+    from app.services.notifier import broker
+    from app.services.security import hash_pool_stats
+    return {
+        "status": "healthy",
+        "caches": {cache.name: cache.stats() for cache in (aqi_cache, tile_cache, response_cache)},
+        "streams": broker.stats(),
+        "password_hashing": hash_pool_stats()
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    from app.services.external_apis import aqi_cache
+    from app.services.tiles import tile_cache
+    from app.api.caching import response_cache
+    return PlainTextResponse(
+        render_metrics((aqi_cache, tile_cache, response_cache)),
+        media_type="text/plain; version=0.0.4"
+    )
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,179 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.bulk import chunked, dialect_insert
+from app.db.models import Alert, User, UserProfile, generate_uuid
+from app.db.session import SessionLocal
+from app.services.notifier import broker
+from app.services.scheduler import PeriodicTask
+
+def alert_window(now=None):
+    """
+    Index of the fixed window containing now. Only used in dedup keys, so
+    evaluators racing on the same snapshot can't insert an alert twice;
+    the spacing between alerts is checked against created_at.
+    """
+    now = now or datetime.utcnow()
+    hours_since_epoch = int((now - datetime(1970, 1, 1)).total_seconds() // 3600)
+    return hours_since_epoch // settings.ALERT_DEDUP_WINDOW_HOURS
+
+def dedup_key(window, user_id, city):
+    # Window first so all keys of one window are a single index range
+    return f"{window}:{user_id}:{city.lower()}"
+
+def city_peaks(snapshot):
+    """Highest AQI reported per city in a snapshot, with the station reporting it"""
+    peaks = {}
+    for reading in snapshot.get("data", []):
+        if reading.get("aqi") is None:
+            continue
+        city = reading["city"]
+        if city not in peaks or reading["aqi"] > peaks[city][0]:
+            peaks[city] = (reading["aqi"], reading["station_id"])
+    return peaks
+
+def evaluate_alerts(db, snapshot, user_ids=None, now=None):
+    """
+    Create alerts for every active user whose threshold is exceeded by a
+    city in the snapshot, unless that user was already alerted about the
+    city in the last ALERT_DEDUP_WINDOW_HOURS.
+
+    Thresholds are fetched in one query and compared against all cities at
+    once; recent alerts of the users concerned come from range scans on
+    (user_id, city, created_at). Returns the inserted alert rows.
+    """
+    now = now or datetime.utcnow()
+    peaks = city_peaks(snapshot)
+    if not peaks:
+        return []
+
+    cities = list(peaks)
+    city_aqi = np.array([peaks[city][0] for city in cities])
+
+    query = (
+        select(UserProfile.user_id, UserProfile.alert_threshold)
+        .join(User, User.id == UserProfile.user_id)
+        .where(
+            User.is_active == True,
+            UserProfile.alert_threshold.isnot(None),
+            UserProfile.alert_threshold < int(city_aqi.max())
+        )
+    )
+    if user_ids is not None:
+        query = query.where(UserProfile.user_id.in_(user_ids))
+    profiles = db.execute(query).all()
+    if not profiles:
+        return []
+
+    profile_user_ids = [user_id for user_id, _ in profiles]
+    thresholds = np.array([threshold for _, threshold in profiles])
+
+    # users x cities exceedance matrix
+    user_index, city_index = np.nonzero(city_aqi[None, :] > thresholds[:, None])
+    if len(user_index) == 0:
+        return []
+
+    alerted_user_ids = sorted({profile_user_ids[u] for u in user_index.tolist()})
+    recent = set()
+    for chunk in chunked(alerted_user_ids, 5000):
+        recent.update(
+            (user_id, city.lower())
+            for user_id, city in db.execute(
+                select(Alert.user_id, Alert.city).where(
+                    Alert.user_id.in_(chunk),
+                    Alert.kind == "aqi_threshold",
+                    Alert.created_at > now - timedelta(hours=settings.ALERT_DEDUP_WINDOW_HOURS)
+                )
+            )
+            if city is not None
+        )
+
+    window = alert_window(now)
+    rows = []
+    for u, c in zip(user_index.tolist(), city_index.tolist()):
+        user_id = profile_user_ids[u]
+        city = cities[c]
+        if (user_id, city.lower()) in recent:
+            continue
+        aqi, station_id = peaks[city]
+        rows.append({
+            "id": generate_uuid(),
+            "user_id": user_id,
+            "message": f"🚨 High AQI Alert for {city}: {aqi} AQI (Your threshold: {int(thresholds[u])})",
+            "aqi_level": aqi,
+            "is_read": False,
+            "kind": "aqi_threshold",
+            "city": city,
+            "station_id": station_id,
+            "dedup_key": dedup_key(window, user_id, city),
+            "created_at": now
+        })
+
+    # ON CONFLICT covers a concurrent evaluator inserting the same key;
+    # only the alerts actually inserted are returned for fan-out
+    stmt = (
+        dialect_insert(db.get_bind(), Alert)
+        .on_conflict_do_nothing(index_elements=["dedup_key"])
+        .returning(Alert.id)
+    )
+    inserted = set()
+    for chunk in chunked(rows, 5000):
+        inserted.update(db.scalars(stmt, chunk))
+    db.commit()
+    return [row for row in rows if row["id"] in inserted]
+
+def run_alert_evaluation(snapshot):
+    db = SessionLocal()
+    try:
+        return evaluate_alerts(db, snapshot)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def fetch_recent_alerts(db, user_ids, since):
+    """Threshold alerts of the given users created after since, oldest first"""
+    alerts = []
+    for chunk in chunked(user_ids, 5000):
+        alerts.extend(
+            dict(row)
+            for row in db.execute(
+                select(
+                    Alert.id, Alert.user_id, Alert.message, Alert.aqi_level, Alert.is_read,
+                    Alert.kind, Alert.city, Alert.station_id, Alert.created_at
+                ).where(
+                    Alert.user_id.in_(chunk),
+                    Alert.kind == "aqi_threshold",
+                    Alert.created_at > since
+                )
+            ).mappings()
+        )
+    return sorted(alerts, key=lambda alert: alert["created_at"])
+
+def run_alert_fetch(user_ids, since):
+    db = SessionLocal()
+    try:
+        return fetch_recent_alerts(db, user_ids, since)
+    finally:
+        db.close()
+
+async def relay_alerts():
+    """
+    Publish alerts inserted by any worker to the streams connected to this
+    one. Only the worker whose insert wins publishes directly, so the
+    others pick the rows up here; alerts this process already published
+    are skipped by the broker.
+    """
+    since = datetime.utcnow() - timedelta(seconds=settings.STREAM_ALERT_LOOKBACK_SECONDS)
+    broker.forget_published_alerts(since)
+    user_ids = broker.user_ids()
+    if not user_ids:
+        return
+    broker.publish_alerts(await asyncio.to_thread(run_alert_fetch, user_ids, since))
+
+alert_relay_task = PeriodicTask("alert-relay", settings.STREAM_ALERT_POLL_SECONDS, relay_alerts)
@@ -0,0 +1,118 @@
+import numpy as np
+
+# US EPA breakpoint tables: (concentration_low, concentration_high, aqi_low, aqi_high).
+# "decimals" is the precision readings are truncated to before lookup, which
+# is what closes the gaps between segments (e.g. 12.0-12.1 for PM2.5).
+BREAKPOINTS = {
+    # 24-hour PM2.5, ug/m3
+    "pm25": {
+        "decimals": 1,
+        "table": [
+            (0.0, 12.0, 0, 50),
+            (12.1, 35.4, 51, 100),
+            (35.5, 55.4, 101, 150),
+            (55.5, 150.4, 151, 200),
+            (150.5, 250.4, 201, 300),
+            (250.5, 350.4, 301, 400),
+            (350.5, 500.4, 401, 500),
+        ],
+    },
+    # 24-hour PM10, ug/m3
+    "pm10": {
+        "decimals": 0,
+        "table": [
+            (0, 54, 0, 50),
+            (55, 154, 51, 100),
+            (155, 254, 101, 150),
+            (255, 354, 151, 200),
+            (355, 424, 201, 300),
+            (425, 504, 301, 400),
+            (505, 604, 401, 500),
+        ],
+    },
+    # 8-hour O3, ppm
+    "o3": {
+        "decimals": 3,
+        "table": [
+            (0.000, 0.054, 0, 50),
+            (0.055, 0.070, 51, 100),
+            (0.071, 0.085, 101, 150),
+            (0.086, 0.105, 151, 200),
+            (0.106, 0.200, 201, 300),
+        ],
+    },
+    # 1-hour NO2, ppb
+    "no2": {
+        "decimals": 0,
+        "table": [
+            (0, 53, 0, 50),
+            (54, 100, 51, 100),
+            (101, 360, 101, 150),
+            (361, 649, 151, 200),
+            (650, 1249, 201, 300),
+            (1250, 1649, 301, 400),
+            (1650, 2049, 401, 500),
+        ],
+    },
+}
+
+def _compile(spec):
+    table = np.asarray(spec["table"], dtype=float)
+    return {
+        "scale": 10.0 ** spec["decimals"],
+        "c_low": table[:, 0],
+        "c_high": table[:, 1],
+        "i_low": table[:, 2],
+        "i_high": table[:, 3],
+    }
+
+_TABLES = {pollutant: _compile(spec) for pollutant, spec in BREAKPOINTS.items()}
+
+def calculate_aqi(concentrations, pollutant="pm25"):
+    """
+    Convert pollutant concentrations to AQI with the EPA piecewise formula.
+
+    Accepts a scalar or any array-like. Scalars return an int (None when the
+    reading is missing); arrays return a float array with NaN for missing
+    readings. Concentrations above the last breakpoint are reported at the
+    table's top AQI, and small negative sensor readings are treated as 0.
+    """
+    tables = _TABLES.get(pollutant)
+    if tables is None:
+        raise ValueError(f"Unsupported pollutant: {pollutant}")
+
+    scalar = np.ndim(concentrations) == 0
+    if scalar and concentrations is None:
+        return None
+    values = np.asarray(concentrations, dtype=float)
+    values = np.clip(values, 0, None)
+
+    # Truncate to the table's precision; the epsilon absorbs float noise
+    # such as 12.1 being stored as 12.0999999
+    scale = tables["scale"]
+    values = np.floor(values * scale + 1e-6) / scale
+
+    last = len(tables["c_high"]) - 1
+    above = values > tables["c_high"][last]
+    segment = np.minimum(np.searchsorted(tables["c_high"], values, side="left"), last)
+
+    c_low = tables["c_low"][segment]
+    c_high = tables["c_high"][segment]
+    i_low = tables["i_low"][segment]
+    i_high = tables["i_high"][segment]
+
+    aqi = np.rint((i_high - i_low) / (c_high - c_low) * (values - c_low) + i_low)
+    aqi = np.where(above, tables["i_high"][last], aqi)
+
+    if scalar:
+        return None if np.isnan(aqi) else int(aqi)
+    return aqi
+
+def calculate_aqi_list(concentrations, pollutant="pm25"):
+    """Batch conversion returning plain ints (None for missing) for JSON payloads"""
+    aqi = calculate_aqi(np.asarray(concentrations, dtype=float).reshape(-1), pollutant)
+    return [None if value != value else int(value) for value in aqi.tolist()]
+
+def calculate_aqi_from_pm25(pm25):
+    """Convert PM2.5 concentration to AQI"""
+    return calculate_aqi(pm25, "pm25")
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """
+    Bounded LRU cache with per-entry TTL.
+
+    get_or_load coalesces concurrent misses into a single loader call and,
+    once an entry expires, keeps serving it for up to stale_seconds while a
+    background refresh runs. on_evict(key, value) is called for entries
+    pushed out to make room.
+    """
+    def __init__(self, name, ttl_seconds, max_entries=256, stale_seconds=0, on_evict=None):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._inflight = {}  # key -> asyncio.Task
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.refresh_errors = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return a fresh value without loading; expired entries count as misses"""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl_seconds:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        return default
+
+    def set(self, key, value):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted_key, (evicted, _) = self._entries.popitem(last=False)
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted)
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, calling the async loader on a miss
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            if age < self.ttl_seconds + self.stale_seconds:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                self._start_load(key, loader)
+                return value
+
+        self.misses += 1
+        return await asyncio.shield(self._start_load(key, loader))
+
+    def _start_load(self, key, loader):
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+
+        async def load():
+            try:
+                value = await loader()
+                self.set(key, value)
+                return value
+            finally:
+                self._inflight.pop(key, None)
+
+        task = asyncio.create_task(load())
+        task.add_done_callback(self._log_refresh_error)
+        self._inflight[key] = task
+        return task
+
+    def _log_refresh_error(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            self.refresh_errors += 1
+            print(f"{self.name} cache load failed: {task.exception()}")
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "refresh_errors": self.refresh_errors,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 3) if lookups else None
+        }
@@ -0,0 +1,143 @@
+import gzip
+import io
+
+import pandas as pd
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.db.models import Station
+from app.db.session import read_engine
+from app.db.storage import measurement_table
+
+EXPORT_COLUMNS = ("station_id", "city", "measured_at", "pm25", "pm10", "aqi")
+EXPORT_FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "csv": ("application/gzip", "csv.gz"),
+}
+# Formats written with pyarrow, which is only imported when one is requested
+ARROW_FORMATS = ("arrow", "parquet")
+
+class ExportUnavailable(Exception):
+    pass
+
+class _Drain(io.RawIOBase):
+    """
+    Write-only sink whose bytes are handed to the response as they are
+    produced. tell() keeps counting across drains, which the Parquet
+    writer relies on for its footer offsets.
+    """
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def export_query(station_ids=None, city=None, start=None, end=None, table=None):
+    """Raw readings matching the filters, in (station, time) index order"""
+    table = measurement_table() if table is None else table
+    query = (
+        select(
+            table.c.station_id, Station.city, table.c.measured_at,
+            table.c.pm25, table.c.pm10, table.c.aqi
+        )
+        .join(Station, Station.id == table.c.station_id)
+    )
+    if station_ids:
+        query = query.where(table.c.station_id.in_(station_ids))
+    if city:
+        query = query.where(func.lower(Station.city) == city.lower())
+    if start is not None:
+        query = query.where(table.c.measured_at >= start)
+    if end is not None:
+        query = query.where(table.c.measured_at < end)
+    return query.order_by(table.c.station_id, table.c.measured_at)
+
+def check_format(fmt):
+    if fmt in ARROW_FORMATS:
+        try:
+            import pyarrow
+        except ImportError:
+            raise ExportUnavailable(f"{fmt} export requires pyarrow on the server")
+
+def _batches(query, batch_size):
+    """
+    Column-oriented batches from a server-side cursor, so only one batch of
+    rows is ever held in memory
+    """
+    with read_engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        for rows in result.partitions():
+            yield pd.DataFrame(rows, columns=EXPORT_COLUMNS)
+
+def _arrow_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("station_id", pa.string()),
+        ("city", pa.string()),
+        ("measured_at", pa.timestamp("us")),
+        ("pm25", pa.float64()),
+        ("pm10", pa.float64()),
+        ("aqi", pa.int16()),
+    ])
+
+def _to_record_batch(frame, schema):
+    import pyarrow as pa
+    frame = frame.assign(measured_at=pd.to_datetime(frame["measured_at"]))
+    return pa.RecordBatch.from_pandas(frame, schema=schema, preserve_index=False)
+
+def stream_export(fmt, query, batch_size=None):
+    """
+    Encode the query's rows chunk by chunk as an Arrow IPC stream, Parquet
+    (one row group per batch) or gzip CSV. A sync generator, so Starlette
+    drives it from its threadpool.
+    """
+    batch_size = batch_size or settings.EXPORT_BATCH_ROWS
+    sink = _Drain()
+
+    if fmt in ARROW_FORMATS:
+        import pyarrow.ipc
+        import pyarrow.parquet as pq
+
+        schema = _arrow_schema()
+        if fmt == "arrow":
+            writer = pyarrow.ipc.new_stream(sink, schema)
+        else:
+            writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        try:
+            for frame in _batches(query, batch_size):
+                batch = _to_record_batch(frame, schema)
+                if fmt == "arrow":
+                    writer.write_batch(batch)
+                else:
+                    writer.write_batch(batch, row_group_size=batch_size)
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+        return
+
+    with gzip.GzipFile(fileobj=sink, mode="wb", compresslevel=6) as archive:
+        header = True
+        for frame in _batches(query, batch_size):
+            archive.write(frame.to_csv(index=False, header=header, date_format="%Y-%m-%dT%H:%M:%S").encode())
+            header = False
+            yield sink.drain()
+        if header:
+            archive.write((",".join(EXPORT_COLUMNS) + "\n").encode())
+    yield sink.drain()
@@ -1,43 +1,83 @@
-import requests
-import os
 import random
 from datetime import datetime
 from app.core.config import settings
+from app.services.aqi_index import calculate_aqi_list
+from app.services.cache import TTLCache
+from app.services.http_client import get_json
+
+# Current AQI snapshots keyed by (city, lat/lon bucket, source)
+aqi_cache = TTLCache(
+    "current-aqi",
+    ttl_seconds=settings.AQI_CACHE_TTL_SECONDS,
+    max_entries=settings.AQI_CACHE_MAX_ENTRIES,
+    stale_seconds=settings.AQI_CACHE_STALE_SECONDS
+)
+
+SAMPLE_CACHE_KEY = (None, None, "sample")
+
+def use_sample_data():
+    return settings.USE_SAMPLE_DATA or not settings.OPENA_API_KEY
+
+def current_aqi_cache_key(latitude=None, longitude=None, city=None):
+    if use_sample_data():
+        # Sample data ignores location filters, so all requests share one entry
+        return SAMPLE_CACHE_KEY
+    bucket = None
+    if latitude is not None and longitude is not None:
+        precision = settings.AQI_CACHE_COORD_PRECISION
+        bucket = (round(latitude, precision), round(longitude, precision))
+    return (city.lower() if city else None, bucket, "openaq")
 
 async def get_current_aqi(latitude=None, longitude=None, city=None):
     """
-    Get current AQI data for Pakistani cities
-    Uses OpenAQ API with fallback to realistic sample data for Pakistan
+    Get current AQI data for Pakistani cities through the snapshot cache
     """
-    if settings.USE_SAMPLE_DATA or not settings.OPENA_API_KEY:
-        return await get_pakistan_cities_data()
-    
     try:
-        # Try OpenAQ API for real data
-        headers = {"Authorization": f"Bearer {settings.OPENA_API_KEY}"} if settings.OPENA_API_KEY else {}
-        
-        params = {'country': 'PK', 'parameter': 'pm25', 'limit': 100}
-        if city:
-            params['city'] = city
-        
-        response = requests.get(
-            "https://api.openaq.org/v2/latest",
-            params=params,
-            headers=headers,
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            return process_openaq_data(data)
-        else:
-            raise Exception(f"OpenAQ API error: {response.status_code}")
-            
+        return await load_current_aqi(latitude, longitude, city)
     except Exception as e:
+        # Sample readings stand in for this response only and are never
+        # cached, so the next request retries upstream
         print(f"External API error: {e}")
-        return await get_pakistan_cities_data()
+        return await generate_pakistan_cities_data()
+
+async def load_current_aqi(latitude=None, longitude=None, city=None):
+    """
+    Cached current AQI snapshot, raising when upstream fails and no entry
+    (fresh or stale) is left, instead of falling back to sample data
+    """
+    # The loader raises on upstream errors, so the cache keeps serving a
+    # stale entry while it lasts and records the failed refresh
+    return await aqi_cache.get_or_load(
+        current_aqi_cache_key(latitude, longitude, city),
+        lambda: fetch_current_aqi(latitude, longitude, city)
+    )
+
+async def fetch_current_aqi(latitude=None, longitude=None, city=None):
+    """
+    Fetch current AQI data for Pakistani cities, bypassing the cache
+    Uses OpenAQ API, or realistic sample data for Pakistan when sample data
+    is configured. Upstream errors are raised, never replaced with samples.
+    """
+    if use_sample_data():
+        return await generate_pakistan_cities_data()
+
+    headers = {"Authorization": f"Bearer {settings.OPENA_API_KEY}"} if settings.OPENA_API_KEY else {}
+
+    params = {'country': 'PK', 'parameter': 'pm25', 'limit': 100}
+    if city:
+        params['city'] = city
+
+    data = await get_json(
+        f"{settings.OPENAQ_BASE_URL}/latest",
+        params=params,
+        headers=headers
+    )
+    return process_openaq_data(data)
 
 async def get_pakistan_cities_data():
+    return await aqi_cache.get_or_load(SAMPLE_CACHE_KEY, generate_pakistan_cities_data)
+
+async def generate_pakistan_cities_data():
     """
     Realistic sample data for major Pakistani cities based on typical air quality
     """
@@ -145,8 +185,9 @@ async def get_pakistan_cities_data():
     ]
     
     # Calculate AQI for each city
-    for city_data in pakistan_cities:
-        city_data["aqi"] = calculate_aqi_from_pm25(city_data["pm25"])
+    aqi_values = calculate_aqi_list([city_data["pm25"] for city_data in pakistan_cities])
+    for city_data, aqi in zip(pakistan_cities, aqi_values):
+        city_data["aqi"] = aqi
     
     return {"data": pakistan_cities, "source": "pakistan_cities_sample"}
 
@@ -156,6 +197,7 @@ def process_openaq_data(data):
     for result in data.get('results', []):
         measurements = result.get('measurements', [])
         pm25 = next((m for m in measurements if m['parameter'] == 'pm25'), None)
+        pm10 = next((m for m in measurements if m['parameter'] == 'pm10'), None)
         
         if pm25:
             processed.append({
@@ -165,23 +207,14 @@ def process_openaq_data(data):
                 "latitude": result['coordinates']['latitude'],
                 "longitude": result['coordinates']['longitude'],
                 "pm25": pm25['value'],
-                "aqi": calculate_aqi_from_pm25(pm25['value']),
+                "pm10": pm10['value'] if pm10 else None,
+                "aqi": None,
                 "last_updated": result['lastUpdated']
             })
+
+    # Convert the whole batch in one vectorized pass
+    aqi_values = calculate_aqi_list([reading["pm25"] for reading in processed])
+    for reading, aqi in zip(processed, aqi_values):
+        reading["aqi"] = aqi
     
     return {"data": processed, "source": "openaq"}
-
-def calculate_aqi_from_pm25(pm25):
-    """Convert PM2.5 concentration to AQI"""
-    if pm25 <= 12:
-        return int((pm25 / 12) * 50)
-    elif pm25 <= 35.4:
-        return int(((pm25 - 12.1) / (35.4 - 12.1)) * 50 + 51)
-    elif pm25 <= 55.4:
-        return int(((pm25 - 35.5) / (55.4 - 35.5)) * 50 + 101)
-    elif pm25 <= 150.4:
-        return int(((pm25 - 55.5) / (150.4 - 55.5)) * 100 + 151)
-    elif pm25 <= 250.4:
-        return int(((pm25 - 150.5) / (250.4 - 150.5)) * 100 + 201)
-    else:
-        return int(((pm25 - 250.5) / (350.4 - 250.5)) * 100 + 301)
\ No newline at end of file
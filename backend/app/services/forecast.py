@@ -1,70 +1,569 @@
 import pandas as pd
 import numpy as np
+from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
-import random
+import asyncio
+import pickle
+import zlib
+
+from sqlalchemy import select, delete, func
+
+from app.core.config import settings
+from app.db.bulk import chunked, dialect_insert
+from app.db.models import Station, Forecast
+from app.db.session import SessionLocal
+from app.db.storage import measurement_table
+from app.services.aqi_index import calculate_aqi, calculate_aqi_list
+from app.services.cache import TTLCache
+from app.services.scheduler import PeriodicTask
+
+def current_hour():
+    return datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+
+class ForecastModel(ABC):
+    """
+    Base interface for forecasting engines.
+
+    A series is a (station_id, city) pair; station_id may be None when only
+    the city is known. predict_batch forecasts many series in one call and
+    returns a (len(series), hours) array of PM2.5 values.
+    """
+    name = "base"
+
+    def fit(self, history):
+        """Fit on a DataFrame of station_id, city, measured_at, pm25 readings"""
+        return self
+
+    @abstractmethod
+    def predict_batch(self, series, hours=48, start=None, recent=None):
+        """(len(series), hours) array of PM2.5 forecasts starting at start"""
+
+    def confidence_bounds(self, values, series):
+        """Lower/upper bounds with the same shape as values"""
+        return values * 0.8, values * 1.2
+
+    def predict(self, city, hours=48, start=None, station_id=None):
+        """Return the hourly time index and PM2.5 forecast values as arrays"""
+        start = start or current_hour()
+        values = self.predict_batch([(station_id, city)], hours, start)[0]
+        return pd.date_range(start, periods=hours, freq="h"), values
+
+    def generate_forecast(self, city, hours=48, start=None, station_id=None):
+        """Generate PM2.5 forecast with daily patterns and trends"""
+        timestamps, forecast_values = self.predict(city, hours, start, station_id)
+        lower, upper = self.confidence_bounds(forecast_values[None, :], [(station_id, city)])
+
+        # Confidence intervals
+        return format_forecast(timestamps, forecast_values, lower[0], upper[0])
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+def load_model(path):
+    """Load a model artifact written by ForecastModel.save"""
+    with open(path, "rb") as f:
+        model = pickle.load(f)
+    if not isinstance(model, ForecastModel):
+        raise ValueError(f"{path} does not contain a forecast model")
+    return model
+
+def _daytime_multiplier(timestamps):
+    # Daily pattern: higher during day, lower at night
+    hour_of_day = timestamps.hour.to_numpy()
+    return np.where((hour_of_day >= 6) & (hour_of_day <= 20), 1.2, 0.8)
+
+class SimpleForecastModel(ForecastModel):
+    name = "simple"
 
-class SimpleForecastModel:
     def __init__(self):
         self.city_baselines = {
             "islamabad": 45,
-            "lahore": 180, 
+            "lahore": 180,
             "karachi": 85,
             "rawalpindi": 55,
             "faisalabad": 120,
         }
-    
-    def generate_forecast(self, city, hours=48):
-        """Generate PM2.5 forecast with daily patterns and trends"""
-        base_value = self.city_baselines.get(city.lower(), 75)
-        forecasts = []
-        
-        current_time = datetime.utcnow()
-        
-        for i in range(hours):
-            forecast_time = current_time + timedelta(hours=i)
-            hour_of_day = forecast_time.hour
-            
-            # Daily pattern: higher during day, lower at night
-            if 6 <= hour_of_day <= 20:  # Daytime
-                multiplier = 1.2
-            else:  # Nighttime
-                multiplier = 0.8
-            
-            # Add some trend (slight increase over time)
-            trend = 1 + (i * 0.005)  # 0.5% increase per hour
-            
-            # Random variation
-            variation = random.uniform(0.9, 1.1)
-            
-            # Calculate forecast value
-            forecast_value = base_value * multiplier * trend * variation
-            forecast_value = max(10, forecast_value)  # Ensure positive
-            
-            # Confidence intervals
-            confidence_lower = forecast_value * 0.8
-            confidence_upper = forecast_value * 1.2
-            
-            forecasts.append({
-                "timestamp": forecast_time.isoformat(),
-                "pm25": round(forecast_value, 1),
-                "confidence_lower": round(confidence_lower, 1),
-                "confidence_upper": round(confidence_upper, 1)
-            })
-        
-        return forecasts
+
+    def predict_batch(self, series, hours=48, start=None, recent=None):
+        start = start or current_hour()
+        timestamps = pd.date_range(start, periods=hours, freq="h")
+
+        base_values = np.array(
+            [self.city_baselines.get(city.lower(), 75) for _, city in series], dtype=float
+        )
+        multiplier = _daytime_multiplier(timestamps)
+
+        # Add some trend (slight increase over time)
+        trend = 1 + np.arange(hours) * 0.005  # 0.5% increase per hour
+
+        # Random variation, seeded so the same city and start hour reproduce
+        variation = np.vstack([
+            np.random.default_rng(
+                zlib.crc32(f"{city.lower()}:{start.isoformat()}".encode())
+            ).uniform(0.9, 1.1, hours)
+            for _, city in series
+        ]) if series else np.empty((0, hours))
+
+        return np.maximum(10, base_values[:, None] * (multiplier * trend)[None, :] * variation)
+
+class SeasonalARModel(ForecastModel):
+    """
+    Log-space autoregressive model with hourly lags 1 and 24 and a
+    time-of-day harmonic, fitted per station by least squares.
+
+    Stations with too little history use coefficients pooled over their
+    city, then over all stations.
+    """
+    name = "seasonal_ar"
+    min_training_hours = 72
+
+    def __init__(self):
+        self.coefficients = {}  # key -> (5,) array
+        self.residual_std = {}
+        self.tails = {}  # key -> last 24 hourly log values seen in training
+        self.trained_until = None
+
+    @staticmethod
+    def _features(lag1, lag24, hours_of_day):
+        angle = 2 * np.pi * hours_of_day / 24
+        return np.column_stack([
+            np.ones_like(lag1), lag1, lag24, np.sin(angle), np.cos(angle)
+        ])
+
+    def _fit_series(self, hourly, required=False):
+        """Least-squares fit on one or more stacked hourly log series"""
+        designs, targets = [], []
+        for values, index in hourly:
+            if len(values) <= 24:
+                continue
+            design = self._features(values[23:-1], values[:-24], index.hour.to_numpy()[24:])
+            target = values[24:]
+            valid = ~np.isnan(design).any(axis=1) & ~np.isnan(target)
+            designs.append(design[valid])
+            targets.append(target[valid])
+        if not designs or sum(len(t) for t in targets) < self.min_training_hours:
+            return None
+        design = np.vstack(designs)
+        target = np.concatenate(targets)
+        coef, *_ = np.linalg.lstsq(design, target, rcond=None)
+        if abs(coef[1]) + abs(coef[2]) >= 1 and not required:
+            # Explosive lag weights would diverge over a multi-day horizon
+            return None
+        residuals = target - design @ coef
+        return coef, float(residuals.std())
+
+    def fit(self, history):
+        frame = history.dropna(subset=["pm25"])
+        frame = frame.assign(log_pm25=np.log(frame["pm25"].clip(lower=1)))
+        self.trained_until = frame["measured_at"].max()
+
+        by_city = {}
+        hourly_all = []
+        for (station_id, city), group in frame.groupby(["station_id", "city"]):
+            hourly = group.set_index("measured_at")["log_pm25"].resample("h").mean()
+            hourly = hourly.interpolate(limit=3)
+            entry = (hourly.to_numpy(), hourly.index)
+            by_city.setdefault(city.lower(), []).append(entry)
+            hourly_all.append(entry)
+
+            fitted = self._fit_series([entry])
+            if fitted is not None:
+                self.coefficients[station_id], self.residual_std[station_id] = fitted
+            tail = hourly.to_numpy()[-24:]
+            if len(tail) == 24:
+                self.tails[station_id] = tail
+
+        for city, entries in by_city.items():
+            fitted = self._fit_series(entries)
+            if fitted is not None:
+                self.coefficients[city], self.residual_std[city] = fitted
+            tails = [values[-24:] for values, _ in entries if len(values) >= 24]
+            if tails:
+                self.tails[city] = np.nanmean(np.vstack(tails), axis=0)
+
+        fitted = self._fit_series(hourly_all, required=True)
+        if fitted is None:
+            raise ValueError("Not enough history to fit a seasonal AR model")
+        self.coefficients[None], self.residual_std[None] = fitted
+        tails = [values[-24:] for values, _ in hourly_all if len(values) >= 24]
+        self.tails[None] = np.nanmean(np.vstack(tails), axis=0)
+        return self
+
+    def _lookup(self, table, station_id, city):
+        if station_id is not None and station_id in table:
+            return table[station_id]
+        if city and city.lower() in table:
+            return table[city.lower()]
+        return table[None]
+
+    def predict_batch(self, series, hours=48, start=None, recent=None):
+        """
+        recent optionally maps station_id to its last 24 hourly PM2.5 values
+        ending just before start; otherwise the tails seen in training are used
+        """
+        start = start or current_hour()
+        timestamps = pd.date_range(start, periods=hours, freq="h")
+        recent = recent or {}
+
+        coef = np.vstack([self._lookup(self.coefficients, sid, city) for sid, city in series])
+        history = np.vstack([
+            np.log(np.clip(recent[sid], 1, None))
+            if sid in recent and not np.isnan(recent[sid]).all()
+            else self._lookup(self.tails, sid, city)
+            for sid, city in series
+        ])
+        # Fill gaps in the lag window with each series' mean level
+        row_means = np.nanmean(history, axis=1)
+        history = np.where(np.isnan(history), row_means[:, None], history)
+
+        # Recursive multi-step forecast, vectorized across all series
+        window = np.concatenate([history, np.empty((len(series), hours))], axis=1)
+        angle = 2 * np.pi * timestamps.hour.to_numpy() / 24
+        for step in range(hours):
+            t = 24 + step
+            window[:, t] = (
+                coef[:, 0]
+                + coef[:, 1] * window[:, t - 1]
+                + coef[:, 2] * window[:, t - 24]
+                + coef[:, 3] * np.sin(angle[step])
+                + coef[:, 4] * np.cos(angle[step])
+            )
+        return np.maximum(1, np.exp(window[:, 24:]))
+
+    def confidence_bounds(self, values, series):
+        # 80% interval from each series' residual spread in log space
+        std = np.array([self._lookup(self.residual_std, sid, city) for sid, city in series])
+        spread = np.exp(1.2816 * std)[:, None]
+        return values / spread, values * spread
+
+MODELS = {
+    SimpleForecastModel.name: SimpleForecastModel,
+    SeasonalARModel.name: SeasonalARModel,
+}
+
+def format_forecast(timestamps, pm25, confidence_lower, confidence_upper):
+    """Round forecast arrays and turn them into the API's list of points"""
+    pm25 = np.round(np.asarray(pm25, dtype=float), 1)
+    aqi_values = calculate_aqi_list(pm25)
+
+    return [
+        {
+            "timestamp": timestamp,
+            "pm25": value,
+            "confidence_lower": lower,
+            "confidence_upper": upper,
+            "aqi": aqi
+        }
+        for timestamp, value, lower, upper, aqi in zip(
+            pd.DatetimeIndex(timestamps).strftime("%Y-%m-%dT%H:%M:%S"),
+            pm25.tolist(),
+            np.round(np.asarray(confidence_lower, dtype=float), 1).tolist(),
+            np.round(np.asarray(confidence_upper, dtype=float), 1).tolist(),
+            aqi_values
+        )
+    ]
 
 # Global forecast model instance
 _forecast_model = SimpleForecastModel()
+# Bumped whenever served forecasts may change (new model, new precompute)
+_forecast_version = 0
+
+def get_forecast_model():
+    return _forecast_model
+
+def get_forecast_version():
+    """Changes with the model, each precompute and every hour"""
+    return _forecast_version, current_hour()
+
+def set_forecast_model(model):
+    global _forecast_model, _forecast_version
+    _forecast_model = model
+    _forecast_version += 1
+    _forecast_cache.invalidate()
+
+def load_configured_model():
+    """
+    Load the artifact at FORECAST_MODEL_PATH once at startup, keeping the
+    simple model if none is configured or it can't be read
+    """
+    if not settings.FORECAST_MODEL_PATH:
+        return _forecast_model
+    try:
+        set_forecast_model(load_model(settings.FORECAST_MODEL_PATH))
+    except Exception as e:
+        print(f"Could not load forecast model {settings.FORECAST_MODEL_PATH}: {e}")
+    return _forecast_model
+
+def load_history_frame(db, since, station_ids=None):
+    """Measurements since a point in time as a station_id/city/measured_at/pm25 frame"""
+    table = measurement_table()
+    query = (
+        select(table.c.station_id, Station.city, table.c.measured_at, table.c.pm25)
+        .join(Station, Station.id == table.c.station_id)
+        .where(table.c.measured_at >= since)
+    )
+    if station_ids is not None:
+        query = query.where(table.c.station_id.in_(station_ids))
+    rows = db.execute(query).all()
+    frame = pd.DataFrame(rows, columns=["station_id", "city", "measured_at", "pm25"])
+    frame["measured_at"] = pd.to_datetime(frame["measured_at"])
+    return frame
+
+def recent_hourly_values(frame, start, hours=24):
+    """Per-station arrays of the hourly mean PM2.5 for the hours before start"""
+    index = pd.date_range(end=start - timedelta(hours=1), periods=hours, freq="h")
+    if frame.empty:
+        return {}
+    hourly = (
+        frame.set_index("measured_at")
+        .groupby("station_id")["pm25"]
+        .resample("h")
+        .mean()
+        .unstack(level=0)
+        .reindex(index)
+    )
+    return {station_id: hourly[station_id].to_numpy() for station_id in hourly.columns}
 
-async def get_pm25_forecast(city, hours=48):
+# Forecasts keyed by (city, start hour, horizon); an entry is only reused
+# within the hour it was generated for
+_forecast_cache = TTLCache(
+    "forecast",
+    ttl_seconds=3600,
+    max_entries=settings.FORECAST_CACHE_MAX_ENTRIES
+)
+
+def precompute_forecasts(start=None, hours=None):
     """
-    Get PM2.5 forecast for a city
+    Forecast every active station from start and upsert the rows into the
+    forecasts table, dropping rows for hours that have already passed
     """
-    forecast_data = _forecast_model.generate_forecast(city, hours)
-    
+    global _forecast_version
+    start = start or current_hour()
+    hours = hours or settings.FORECAST_PRECOMPUTE_HOURS
+
+    db = SessionLocal()
+    try:
+        stations = db.query(Station.id, Station.city).filter(Station.is_active == True).all()
+        series = [(station_id, city) for station_id, city in stations]
+        model = _forecast_model
+
+        recent = None
+        if not isinstance(model, SimpleForecastModel):
+            frame = load_history_frame(db, start - timedelta(hours=24))
+            recent = recent_hourly_values(frame, start)
+
+        # One batched inference call for every station
+        timestamps = pd.date_range(start, periods=hours, freq="h").to_pydatetime()
+        values = model.predict_batch(series, hours, start, recent=recent)
+        lower, upper = model.confidence_bounds(values, series)
+        values, lower, upper = (np.round(a, 1).tolist() for a in (values, lower, upper))
+        created_at = datetime.utcnow()
+
+        def rows():
+            for i, (station_id, _) in enumerate(series):
+                for j, forecasted_for in enumerate(timestamps):
+                    yield {
+                        "station_id": station_id,
+                        "forecasted_for": forecasted_for,
+                        "pm25": values[i][j],
+                        "confidence_lower": lower[i][j],
+                        "confidence_upper": upper[i][j],
+                        "created_at": created_at
+                    }
+
+        stmt = dialect_insert(db.get_bind(), Forecast)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["station_id", "forecasted_for"],
+            set_={
+                "pm25": stmt.excluded.pm25,
+                "confidence_lower": stmt.excluded.confidence_lower,
+                "confidence_upper": stmt.excluded.confidence_upper,
+                "created_at": stmt.excluded.created_at,
+            }
+        )
+        for chunk in chunked(rows(), 5000):
+            db.execute(stmt, chunk)
+
+        db.execute(delete(Forecast).where(Forecast.forecasted_for < start))
+        db.commit()
+        _forecast_version += 1
+        return len(stations)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def run_forecast_precompute():
+    await asyncio.to_thread(precompute_forecasts)
+
+forecast_precompute_task = PeriodicTask(
+    "forecast-precompute",
+    3600,
+    run_forecast_precompute,
+    align_to_interval=True
+)
+
+def load_precomputed_forecast(db, city, hours, start):
+    """
+    Read a city's stored forecast, or None if the table doesn't cover the
+    full horizon yet
+    """
+    station_id = (
+        select(Station.id)
+        .where(func.lower(Station.city) == city.lower(), Station.is_active == True)
+        .order_by(Station.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        select(
+            Forecast.forecasted_for,
+            Forecast.pm25,
+            Forecast.confidence_lower,
+            Forecast.confidence_upper
+        )
+        .where(Forecast.station_id == station_id, Forecast.forecasted_for >= start)
+        .order_by(Forecast.forecasted_for)
+        .limit(hours)
+    ).all()
+    if len(rows) < hours:
+        return None
+
+    timestamps, pm25, lower, upper = zip(*rows)
+    return format_forecast(timestamps, pm25, lower, upper)
+
+async def get_pm25_forecast(city, hours=48, db=None):
+    """
+    Get PM2.5 forecast for a city. db is an AsyncSession; without one the
+    forecast is always generated on demand.
+    """
+    start = current_hour()
+
+    if settings.FORECAST_SOURCE == "precomputed" and db is not None:
+        forecast_data = await db.run_sync(load_precomputed_forecast, city, hours, start)
+        if forecast_data is not None:
+            return {
+                "city": city,
+                "forecast_hours": hours,
+                "forecast": forecast_data,
+                "source": "precomputed",
+                "generated_at": datetime.utcnow().isoformat()
+            }
+
+    key = (city.lower(), start, hours)
+    forecast_data = _forecast_cache.get(key)
+    if forecast_data is None:
+        forecast_data = _forecast_model.generate_forecast(city, hours, start)
+        _forecast_cache.set(key, forecast_data)
+
     return {
         "city": city,
         "forecast_hours": hours,
         "forecast": forecast_data,
+        "source": "on_demand",
+        "generated_at": datetime.utcnow().isoformat()
+    }
+
+def resolve_forecast_series(db, cities=(), station_ids=()):
+    """
+    Turn requested cities and station ids into forecast series. Cities are
+    forecast as (None, city) like the single-city route, with their first
+    active station used for precomputed rows. Returns (series, unknown).
+    """
+    stations = dict(db.execute(
+        select(Station.id, Station.city).where(Station.id.in_(station_ids))
+    ).all()) if station_ids else {}
+
+    primary = {}
+    if cities:
+        rows = db.execute(
+            select(Station.id, Station.city)
+            .where(func.lower(Station.city).in_([city.lower() for city in cities]), Station.is_active == True)
+            .order_by(Station.id)
+        ).all()
+        for station_id, city in rows:
+            primary.setdefault(city.lower(), station_id)
+
+    series = [
+        {"station_id": None, "city": city, "stored_as": primary.get(city.lower())}
+        for city in cities
+    ]
+    series += [
+        {"station_id": station_id, "city": stations[station_id], "stored_as": station_id}
+        for station_id in station_ids if station_id in stations
+    ]
+    unknown = [station_id for station_id in station_ids if station_id not in stations]
+    return series, unknown
+
+def load_precomputed_batch(db, station_ids, hours, start):
+    """
+    Stored forecasts as a (len(station_ids), hours, 3) array of pm25 and
+    confidence bounds, NaN where the table has no row
+    """
+    values = np.full((len(station_ids), hours, 3), np.nan)
+    wanted = [station_id for station_id in station_ids if station_id is not None]
+    if not wanted:
+        return values
+    rows = db.execute(
+        select(
+            Forecast.station_id,
+            Forecast.forecasted_for,
+            Forecast.pm25,
+            Forecast.confidence_lower,
+            Forecast.confidence_upper
+        )
+        .where(
+            Forecast.station_id.in_(set(wanted)),
+            Forecast.forecasted_for >= start,
+            Forecast.forecasted_for < start + timedelta(hours=hours)
+        )
+    ).all()
+    if not rows:
+        return values
+
+    frame = pd.DataFrame(rows, columns=["station_id", "forecasted_for", "pm25", "lower", "upper"])
+    step = ((pd.to_datetime(frame["forecasted_for"]) - start) // pd.Timedelta(hours=1)).to_numpy()
+    stored = frame[["pm25", "lower", "upper"]].to_numpy(dtype=float)
+    for i, station_id in enumerate(station_ids):
+        mask = (frame["station_id"] == station_id).to_numpy()
+        values[i, step[mask]] = stored[mask]
+    return values
+
+def batch_forecast(db, cities=(), station_ids=(), hours=48):
+    """
+    Forecast many cities/stations in one pass and return them column-wise:
+    one row per series in each (series x hour) array. Precomputed rows are
+    used where complete; everything else goes through a single
+    predict_batch call.
+    """
+    start = current_hour()
+    series, unknown = resolve_forecast_series(db, cities, station_ids)
+
+    values = np.full((len(series), hours, 3), np.nan)
+    if settings.FORECAST_SOURCE == "precomputed":
+        values = load_precomputed_batch(db, [s["stored_as"] for s in series], hours, start)
+    missing = np.isnan(values).any(axis=(1, 2))
+
+    if missing.any():
+        model_series = [(s["station_id"], s["city"]) for s, m in zip(series, missing) if m]
+        predicted = _forecast_model.predict_batch(model_series, hours, start)
+        lower, upper = _forecast_model.confidence_bounds(predicted, model_series)
+        values[missing] = np.stack([predicted, lower, upper], axis=-1)
+
+    pm25 = np.round(values[:, :, 0], 1)
+    return {
+        "start": start.isoformat(),
+        "hours": hours,
+        "timestamps": pd.date_range(start, periods=hours, freq="h").strftime("%Y-%m-%dT%H:%M:%S").tolist(),
+        "cities": [s["city"] for s in series],
+        "station_ids": [s["station_id"] for s in series],
+        "sources": ["on_demand" if m else "precomputed" for m in missing.tolist()],
+        "pm25": pm25.tolist(),
+        "confidence_lower": np.round(values[:, :, 1], 1).tolist(),
+        "confidence_upper": np.round(values[:, :, 2], 1).tolist(),
+        "aqi": calculate_aqi(pm25, "pm25").astype(int).tolist(),
+        "unknown_station_ids": unknown,
         "generated_at": datetime.utcnow().isoformat()
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,171 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func
+
+from app.db.models import MeasurementDaily
+from app.db.storage import measurement_table
+
+RESOLUTIONS = ("raw", "hour", "day")
+BUCKET_WIDTHS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+def pick_resolution(days):
+    """Downsample long windows so responses stay a few hundred points"""
+    if days <= 2:
+        return "raw"
+    if days <= 31:
+        return "hour"
+    return "day"
+
+def bucket_expression(column, resolution, dialect_name):
+    if dialect_name == "postgresql":
+        return func.date_trunc(resolution, column)
+    fmt = "%Y-%m-%d %H:00:00" if resolution == "hour" else "%Y-%m-%d 00:00:00"
+    return func.strftime(fmt, column)
+
+def as_datetime(value):
+    # SQLite's strftime buckets come back as strings
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+def _merge_buckets(left, right):
+    """Combine two (samples, pm25_count, pm25_sum, pm25_min, pm25_max, aqi_sum, aqi_max) aggregates"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+
+    def add(a, b):
+        return b if a is None else a if b is None else a + b
+
+    def pick(func, a, b):
+        return b if a is None else a if b is None else func(a, b)
+
+    return (
+        left[0] + right[0],
+        left[1] + right[1],
+        add(left[2], right[2]),
+        pick(min, left[3], right[3]),
+        pick(max, left[4], right[4]),
+        add(left[5], right[5]),
+        pick(max, left[6], right[6]),
+    )
+
+def station_has_history(db, station_id, table=None):
+    """Whether any reading of the station was ever stored, raw or rolled up"""
+    table = measurement_table() if table is None else table
+    for query in (
+        select(table.c.station_id).where(table.c.station_id == station_id),
+        select(MeasurementDaily.station_id).where(MeasurementDaily.station_id == station_id),
+    ):
+        if db.execute(query.limit(1)).first() is not None:
+            return True
+    return False
+
+def query_station_history(db, station_id, start, end, resolution="raw", cursor=None, limit=1000, table=None):
+    """
+    Return one page of a station's readings between start and end.
+
+    Pages are keyed on the last timestamp returned (next_cursor) rather than
+    an offset, so every page is a bounded range scan on
+    (station_id, measured_at). Daily pages also include days that have been
+    rolled up into measurement_daily by the retention job.
+    """
+    table = measurement_table() if table is None else table
+    if cursor is not None:
+        if resolution == "raw":
+            start = max(start, cursor + timedelta(microseconds=1))
+        else:
+            start = max(start, cursor + BUCKET_WIDTHS[resolution])
+
+    filters = (
+        table.c.station_id == station_id,
+        table.c.measured_at >= start,
+        table.c.measured_at <= end,
+    )
+
+    if resolution == "raw":
+        rows = db.execute(
+            select(table.c.measured_at, table.c.pm25, table.c.aqi)
+            .where(*filters)
+            .order_by(table.c.measured_at)
+            .limit(limit + 1)
+        ).all()
+        data = [
+            {
+                "timestamp": measured_at.isoformat(),
+                "pm25": round(pm25, 1) if pm25 is not None else None,
+                "aqi": aqi
+            }
+            for measured_at, pm25, aqi in rows[:limit]
+        ]
+        last_timestamp = rows[limit - 1][0] if len(rows) > limit else None
+    else:
+        bucket = bucket_expression(
+            table.c.measured_at, resolution, db.get_bind().dialect.name
+        ).label("bucket")
+        rows = db.execute(
+            select(
+                bucket,
+                func.count(),
+                func.count(table.c.pm25),
+                func.sum(table.c.pm25),
+                func.min(table.c.pm25),
+                func.max(table.c.pm25),
+                func.sum(table.c.aqi),
+                func.max(table.c.aqi)
+            )
+            .where(*filters)
+            .group_by(bucket)
+            .order_by(bucket)
+            .limit(limit + 1)
+        ).all()
+        buckets = {as_datetime(row[0]): tuple(row[1:]) for row in rows}
+
+        if resolution == "day":
+            # Days past the raw retention window only exist as daily aggregates
+            daily = db.execute(
+                select(
+                    MeasurementDaily.day,
+                    MeasurementDaily.samples,
+                    MeasurementDaily.pm25_count,
+                    MeasurementDaily.pm25_sum,
+                    MeasurementDaily.pm25_min,
+                    MeasurementDaily.pm25_max,
+                    MeasurementDaily.aqi_sum,
+                    MeasurementDaily.aqi_max
+                )
+                .where(
+                    MeasurementDaily.station_id == station_id,
+                    MeasurementDaily.day >= start.replace(hour=0, minute=0, second=0, microsecond=0),
+                    MeasurementDaily.day <= end
+                )
+                .order_by(MeasurementDaily.day)
+                .limit(limit + 1)
+            ).all()
+            for row in daily:
+                day = as_datetime(row[0])
+                buckets[day] = _merge_buckets(buckets.get(day), tuple(row[1:]))
+
+        # Both sources are sorted and limited, so the first limit + 1 merged
+        # buckets are exact
+        keys = sorted(buckets)[:limit + 1]
+        data = []
+        for bucket_start in keys[:limit]:
+            samples, pm25_count, pm25_sum, pm25_min, pm25_max, aqi_sum, aqi_max = buckets[bucket_start]
+            data.append({
+                "timestamp": bucket_start.isoformat(),
+                "pm25": round(pm25_sum / pm25_count, 1) if pm25_count else None,
+                "pm25_min": round(pm25_min, 1) if pm25_min is not None else None,
+                "pm25_max": round(pm25_max, 1) if pm25_max is not None else None,
+                # AQI is derived from PM2.5, so both have the same readings
+                "aqi": int(round(aqi_sum / pm25_count)) if pm25_count and aqi_sum is not None else None,
+                "aqi_max": aqi_max,
+                "samples": samples
+            })
+        last_timestamp = keys[limit - 1] if len(keys) > limit else None
+
+    return {
+        "station_id": station_id,
+        "resolution": resolution,
+        "data": data,
+        "next_cursor": last_timestamp.isoformat() if last_timestamp else None
+    }
@@ -0,0 +1,59 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+from app.services.metrics import upstream_request_duration
+
+_client = None
+_host_semaphores = {}
+
+def get_http_client():
+    """
+    Shared AsyncClient so upstream calls reuse pooled keep-alive connections
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.HTTP_TIMEOUT_SECONDS,
+                connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS
+            )
+        )
+    return _client
+
+def _host_semaphore(url):
+    host = urlsplit(url).netloc
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.HTTP_MAX_CONCURRENCY_PER_HOST)
+        _host_semaphores[host] = semaphore
+    return semaphore
+
+async def get_json(url, params=None, headers=None):
+    """GET a JSON document, capping in-flight requests per upstream host"""
+    async with _host_semaphore(url):
+        # Timed inside the semaphore so queueing behind the per-host cap isn't counted
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = await get_http_client().get(url, params=params, headers=headers)
+            status = str(response.status_code)
+        finally:
+            upstream_request_duration.observe(time.perf_counter() - started, urlsplit(url).netloc, status)
+    response.raise_for_status()
+    return response.json()
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _host_semaphores.clear()
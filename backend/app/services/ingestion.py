@@ -0,0 +1,159 @@
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select, func
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.db.models import Station
+from app.db.storage import measurement_table, store_measurements
+from app.services.alerting import run_alert_evaluation
+from app.services.external_apis import aqi_cache, current_aqi_cache_key, fetch_current_aqi
+from app.services.notifier import broker, snapshot_delta
+from app.services.rollups import apply_rollups
+from app.services.scheduler import PeriodicTask
+from app.services.serialization import CurrentAqi, encode_body
+from app.services.spatial import invalidate_station_index
+
+_latest_snapshot = None
+_latest_snapshot_body = None
+_snapshot_version = 0
+# station_id -> measured_at of the newest row already persisted
+_last_persisted = {}
+
+def get_latest_snapshot():
+    """Most recent ingested AQI snapshot, or None before the first poll"""
+    return _latest_snapshot
+
+def get_latest_snapshot_body():
+    """The latest snapshot already encoded as JSON"""
+    return _latest_snapshot_body
+
+def get_snapshot_version():
+    return _snapshot_version
+
+def parse_timestamp(value):
+    """Parse an upstream ISO timestamp into a naive UTC datetime"""
+    if not value:
+        return datetime.utcnow()
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def persist_snapshot(snapshot):
+    """
+    Upsert the snapshot's stations, bulk-insert one reading per station
+    whose reading is newer than the last one stored and add those readings
+    to the rollup statistics
+    """
+    readings = snapshot.get("data", [])
+    if not readings:
+        return 0
+
+    table = measurement_table()
+    db = SessionLocal()
+    try:
+        station_ids = {reading["station_id"] for reading in readings}
+        existing_ids = {
+            row[0] for row in db.query(Station.id).filter(Station.id.in_(station_ids))
+        }
+        new_stations = []
+        for reading in readings:
+            if reading["station_id"] in existing_ids:
+                continue
+            existing_ids.add(reading["station_id"])
+            new_stations.append({
+                "id": reading["station_id"],
+                "name": reading["station_name"],
+                "city": reading["city"],
+                "latitude": reading["latitude"],
+                "longitude": reading["longitude"],
+                "is_active": True
+            })
+        if new_stations:
+            db.execute(insert(Station), new_stations)
+
+        unseen_ids = [sid for sid in station_ids if sid not in _last_persisted]
+        if unseen_ids:
+            # Prime the dedup map after a restart from what is already stored
+            latest_rows = db.execute(
+                select(table.c.station_id, func.max(table.c.measured_at))
+                .where(table.c.station_id.in_(unseen_ids))
+                .group_by(table.c.station_id)
+            )
+            for station_id, measured_at in latest_rows:
+                _last_persisted[station_id] = measured_at
+
+        measurements = []
+        for reading in readings:
+            measured_at = parse_timestamp(reading.get("last_updated"))
+            last = _last_persisted.get(reading["station_id"])
+            if last is not None and measured_at <= last:
+                continue
+            measurements.append({
+                "station_id": reading["station_id"],
+                "pm25": reading["pm25"],
+                "pm10": reading.get("pm10"),
+                "aqi": reading["aqi"],
+                "measured_at": measured_at
+            })
+        stored = 0
+        if measurements:
+            conn = db.connection()
+            inserted = store_measurements(conn, measurements, table)
+            stored = len(inserted)
+            # Statistics are updated with the rows actually stored (another
+            # worker may have ingested the same snapshot), in the same transaction
+            cities = {reading["station_id"]: reading["city"] for reading in readings}
+            apply_rollups(conn, inserted.assign(city=inserted["station_id"].map(cities)))
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if new_stations:
+        invalidate_station_index()
+    for row in measurements:
+        _last_persisted[row["station_id"]] = row["measured_at"]
+    return stored
+
+async def run_ingestion():
+    """Poll upstream once, persist the readings and publish the snapshot"""
+    global _latest_snapshot, _latest_snapshot_body, _snapshot_version
+
+    # Stand-in sample readings must never be stored, rolled up or alerted
+    # on, so an upstream failure fails this poll and the last real
+    # snapshot stays current. Sample data is only ingested when it's
+    # configured explicitly (USE_SAMPLE_DATA or no API key).
+    snapshot = await fetch_current_aqi()
+    # Keep blocking DB writes off the event loop
+    await asyncio.to_thread(persist_snapshot, snapshot)
+
+    snapshot["ingested_at"] = datetime.utcnow().isoformat()
+    # Encoded once here, through the same response model as every other
+    # /current payload, so the route never re-serializes the snapshot
+    body = encode_body(snapshot, CurrentAqi)
+    aqi_cache.set(current_aqi_cache_key(), snapshot)
+    changed = snapshot_delta(_latest_snapshot, snapshot)
+    _latest_snapshot = snapshot
+    _latest_snapshot_body = body
+    _snapshot_version += 1
+
+    if changed:
+        broker.broadcast("aqi", {"data": changed, "ingested_at": snapshot["ingested_at"]})
+    alerts = await asyncio.to_thread(run_alert_evaluation, snapshot)
+    broker.publish_alerts(alerts)
+    return snapshot
+
+ingestion_task = PeriodicTask(
+    "aqi-ingestion",
+    settings.INGESTION_INTERVAL_SECONDS,
+    run_ingestion
+)
@@ -0,0 +1,177 @@
+import contextvars
+import math
+import threading
+import time
+
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition layout"""
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}  # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(
+                        f"{self.name}_bucket{_labels(self.label_names, labels, ('le', _number(bound)))} {cumulative}"
+                    )
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+REGISTRY = []
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+http_request_duration = register(Histogram(
+    "http_request_duration_seconds", "Time to serve a request, by route template",
+    labels=("method", "route", "status")
+))
+http_request_db_queries = register(Histogram(
+    "http_request_db_queries", "SQL statements executed while serving a request",
+    labels=("method", "route"), buckets=(0, 1, 2, 5, 10, 20, 50, 100, 500)
+))
+http_request_db_seconds = register(Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements while serving a request",
+    labels=("method", "route")
+))
+db_queries = register(Counter("db_queries_total", "SQL statements executed", labels=("database",)))
+db_query_duration = register(Histogram(
+    "db_query_duration_seconds", "Duration of single SQL statements", labels=("database",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+))
+upstream_request_duration = register(Histogram(
+    "upstream_request_duration_seconds", "Outbound HTTP request latency, by upstream host",
+    labels=("host", "status")
+))
+profiled_requests = register(Counter(
+    "profiled_slow_requests_total", "Slow requests whose sampled stacks were written out", labels=("route",)
+))
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+# Set by the metrics middleware; worker threads started with
+# asyncio.to_thread and AsyncSession.run_sync see the same object
+current_request_stats = contextvars.ContextVar("current_request_stats", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+    database = conn.engine.url.get_backend_name()
+    db_queries.inc(database)
+    db_query_duration.observe(elapsed, database)
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+def _handle_error(context):
+    # after_cursor_execute doesn't fire for a failed statement, so drop its
+    # start time here or it stays on the pooled connection for good
+    conn = context.connection
+    if conn is not None and conn.info.get("query_started_at"):
+        conn.info["query_started_at"].pop()
+
+def instrument_engine(db_engine):
+    """Count and time every statement run on a sync engine (or an async engine's sync_engine)"""
+    if not event.contains(db_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(db_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(db_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(db_engine, "handle_error", _handle_error)
+    return db_engine
+
+def observe_request(method, route, status, seconds, stats):
+    http_request_duration.observe(seconds, method, route, str(status))
+    http_request_db_queries.observe(stats.queries, method, route)
+    http_request_db_seconds.observe(stats.db_seconds, method, route)
+
+def _cache_lines(caches):
+    lines = []
+    for name, help, attribute, kind in (
+        ("cache_hits_total", "Fresh cache hits", "hits", "counter"),
+        ("cache_stale_hits_total", "Expired entries served while refreshing", "stale_hits", "counter"),
+        ("cache_misses_total", "Cache misses", "misses", "counter"),
+        ("cache_evictions_total", "Entries evicted for space", "evictions", "counter"),
+        ("cache_entries", "Entries currently cached", None, "gauge"),
+    ):
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+        for cache in caches:
+            value = len(cache) if attribute is None else getattr(cache, attribute)
+            lines.append(f'{name}{{cache="{_escape(cache.name)}"}} {value}')
+    return lines
+
+def render_metrics(caches=()):
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    lines += _cache_lines(caches)
+    return "\n".join(lines) + "\n"
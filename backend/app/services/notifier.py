@@ -0,0 +1,104 @@
+import asyncio
+from collections import defaultdict
+
+from app.core.config import settings
+
+class Subscription:
+    """
+    One connected client. Events go into a bounded queue; when a slow
+    client lets it fill up, the oldest event is dropped and the client is
+    told to resync over REST instead of the server buffering without limit.
+    """
+    def __init__(self, user_id, max_queue_size):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=max_queue_size)
+        self.dropped = 0
+        self.needs_resync = False
+
+    def offer(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.needs_resync = True
+        self.queue.put_nowait(event)
+
+class Broker:
+    """In-process fan-out of push events to connected users"""
+    def __init__(self, max_queue_size, max_connections_per_user):
+        self.max_queue_size = max_queue_size
+        self.max_connections_per_user = max_connections_per_user
+        self._subscriptions = defaultdict(set)  # user_id -> {Subscription}
+        self._published_alerts = {}  # alert id -> created_at, so none goes out twice
+
+    def subscribe(self, user_id):
+        """Register a connection, or return None if the user has too many open"""
+        if len(self._subscriptions[user_id]) >= self.max_connections_per_user:
+            return None
+        subscription = Subscription(user_id, self.max_queue_size)
+        self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id, event_type, data):
+        for subscription in self._subscriptions.get(user_id, ()):
+            subscription.offer((event_type, data))
+
+    def broadcast(self, event_type, data):
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.offer((event_type, data))
+
+    def user_ids(self):
+        return list(self._subscriptions)
+
+    def publish_alerts(self, alerts):
+        """Publish alerts not published by this process before"""
+        for alert in alerts:
+            if alert["id"] in self._published_alerts:
+                continue
+            self._published_alerts[alert["id"]] = alert["created_at"]
+            self.publish(alert["user_id"], "alert", alert)
+
+    def forget_published_alerts(self, before):
+        """Stop remembering alerts created before the relay's lookback"""
+        self._published_alerts = {
+            alert_id: created_at
+            for alert_id, created_at in self._published_alerts.items()
+            if created_at >= before
+        }
+
+    def stats(self):
+        return {
+            "users": len(self._subscriptions),
+            "connections": sum(len(s) for s in self._subscriptions.values()),
+            "dropped_events": sum(
+                subscription.dropped
+                for subscriptions in self._subscriptions.values()
+                for subscription in subscriptions
+            )
+        }
+
+broker = Broker(
+    max_queue_size=settings.STREAM_QUEUE_SIZE,
+    max_connections_per_user=settings.STREAM_MAX_CONNECTIONS_PER_USER
+)
+
+def snapshot_delta(previous, current):
+    """Readings in current whose AQI or PM2.5 differ from previous"""
+    if not previous:
+        return current.get("data", [])
+    before = {
+        reading["station_id"]: (reading["aqi"], reading["pm25"])
+        for reading in previous.get("data", [])
+    }
+    return [
+        reading for reading in current.get("data", [])
+        if before.get(reading["station_id"]) != (reading["aqi"], reading["pm25"])
+    ]
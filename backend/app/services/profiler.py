@@ -0,0 +1,111 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from app.core.config import settings
+from app.services.metrics import profiled_requests
+
+# Innermost frames of threads parked waiting for work, left out of profiles
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+class SlowRequestProfiler:
+    """
+    Opt-in wall-clock sampling profiler for slow requests.
+
+    While any request is in flight a daemon thread snapshots every thread's
+    stack each interval and adds the collapsed stacks to each active
+    request. Requests that finish slower than the threshold are written out
+    in the collapsed ("folded") format that flamegraph.pl and speedscope
+    read. With concurrent requests a request is also charged for the
+    samples of the others, so profile slow endpoints under light load.
+    """
+    def __init__(self, threshold_ms, interval_ms, output_dir):
+        self.threshold_ms = threshold_ms
+        self.interval = interval_ms / 1000
+        self.output_dir = output_dir
+        self._active = {}  # token -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._next_token = 0
+
+    @property
+    def enabled(self):
+        return self.threshold_ms > 0
+
+    def start_request(self):
+        with self._lock:
+            self._next_token += 1
+            token = self._next_token
+            self._active[token] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return token
+
+    def finish_request(self, token, method, route, elapsed_seconds):
+        with self._lock:
+            samples = self._active.pop(token, None)
+        if samples and elapsed_seconds * 1000 >= self.threshold_ms:
+            try:
+                self._write(samples, method, route, elapsed_seconds)
+                profiled_requests.inc(route)
+            except OSError as e:
+                print(f"Failed to write request profile: {e}")
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                idle = not self._active
+                if idle:
+                    self._wake.clear()
+            if idle:
+                self._wake.wait()
+                continue
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = [
+                _collapse(names.get(thread_id, str(thread_id)), frame)
+                for thread_id, frame in sys._current_frames().items()
+                if thread_id != own_id and not _is_idle(frame)
+            ]
+            with self._lock:
+                for samples in self._active.values():
+                    samples.update(stacks)
+            time.sleep(self.interval)
+
+    def _write(self, samples, method, route, elapsed_seconds):
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        filename = f"{time.strftime('%Y%m%dT%H%M%S')}-{method}-{slug}-{int(elapsed_seconds * 1000)}ms.folded"
+        with open(os.path.join(self.output_dir, filename), "w") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+def _is_idle(frame):
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+def _collapse(thread_name, frame):
+    """Root-first 'thread;function (file:line);...' for one thread's stack"""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    frames.append(thread_name)
+    return ";".join(reversed(frames))
+
+profiler = SlowRequestProfiler(
+    settings.PROFILE_SLOW_REQUEST_MS,
+    settings.PROFILE_SAMPLE_INTERVAL_MS,
+    settings.PROFILE_OUTPUT_DIR
+)
@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, text
+
+from app.core.config import settings
+from app.db.bulk import chunked, dialect_insert, sql_add, sql_greatest, sql_least
+from app.db.models import MeasurementDaily
+from app.db.session import engine
+from app.db.storage import (
+    add_months, ensure_partitions, is_partitioned, measurement_table, month_start, partitions_before
+)
+from app.services.history import as_datetime, bucket_expression
+from app.services.scheduler import PeriodicTask
+
+def rollup_readings(conn, table, cutoff):
+    """
+    Fold raw readings older than cutoff into measurement_daily, merging
+    with days that were already rolled up. Returns the number of days written.
+    """
+    day = bucket_expression(table.c.measured_at, "day", conn.dialect.name).label("day")
+    rows = conn.execute(
+        select(
+            table.c.station_id,
+            day,
+            func.count(),
+            func.count(table.c.pm25),
+            func.sum(table.c.pm25),
+            func.min(table.c.pm25),
+            func.max(table.c.pm25),
+            func.count(table.c.pm10),
+            func.sum(table.c.pm10),
+            func.sum(table.c.aqi),
+            func.max(table.c.aqi)
+        )
+        .where(table.c.measured_at < cutoff)
+        .group_by(table.c.station_id, day)
+    ).all()
+    if not rows:
+        return 0
+
+    daily = MeasurementDaily.__table__
+    stmt = dialect_insert(conn, daily)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["station_id", "day"],
+        set_={
+            "samples": daily.c.samples + stmt.excluded.samples,
+            "pm25_count": daily.c.pm25_count + stmt.excluded.pm25_count,
+            "pm25_sum": sql_add(daily.c.pm25_sum, stmt.excluded.pm25_sum),
+            "pm25_min": sql_least(conn, daily.c.pm25_min, stmt.excluded.pm25_min),
+            "pm25_max": sql_greatest(conn, daily.c.pm25_max, stmt.excluded.pm25_max),
+            "pm10_count": daily.c.pm10_count + stmt.excluded.pm10_count,
+            "pm10_sum": sql_add(daily.c.pm10_sum, stmt.excluded.pm10_sum),
+            "aqi_sum": sql_add(daily.c.aqi_sum, stmt.excluded.aqi_sum),
+            "aqi_max": sql_greatest(conn, daily.c.aqi_max, stmt.excluded.aqi_max),
+        }
+    )
+    values = [
+        {
+            "station_id": station_id,
+            "day": as_datetime(day_start),
+            "samples": samples,
+            "pm25_count": pm25_count,
+            "pm25_sum": pm25_sum,
+            "pm25_min": pm25_min,
+            "pm25_max": pm25_max,
+            "pm10_count": pm10_count,
+            "pm10_sum": pm10_sum,
+            "aqi_sum": aqi_sum,
+            "aqi_max": aqi_max,
+        }
+        for station_id, day_start, samples, pm25_count, pm25_sum, pm25_min, pm25_max,
+            pm10_count, pm10_sum, aqi_sum, aqi_max in rows
+    ]
+    for chunk in chunked(values, 5000):
+        conn.execute(stmt, chunk)
+    return len(values)
+
+def maintain_measurements(now=None, table=None):
+    """
+    Create upcoming monthly partitions, then roll raw readings past the
+    retention window up into daily aggregates and remove them. On Postgres
+    whole expired partitions are dropped instead of deleted row by row.
+    """
+    now = now or datetime.utcnow()
+    table = measurement_table() if table is None else table
+    result = {"days_rolled_up": 0, "partitions_dropped": [], "rows_deleted": 0}
+
+    with engine.begin() as conn:
+        current = month_start(now)
+        ensure_partitions(conn, current, add_months(current, settings.MEASUREMENT_PARTITIONS_AHEAD), table)
+
+        if settings.MEASUREMENT_RAW_RETENTION_DAYS <= 0:
+            return result
+        cutoff = (now - timedelta(days=settings.MEASUREMENT_RAW_RETENTION_DAYS)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+
+        result["days_rolled_up"] = rollup_readings(conn, table, cutoff)
+        if is_partitioned(conn, table):
+            for name in partitions_before(conn, cutoff):
+                conn.execute(text(f"DROP TABLE {name}"))
+                result["partitions_dropped"].append(name)
+        result["rows_deleted"] = conn.execute(
+            delete(table).where(table.c.measured_at < cutoff)
+        ).rowcount
+    return result
+
+async def run_measurement_maintenance():
+    result = await asyncio.to_thread(maintain_measurements)
+    if result["days_rolled_up"] or result["partitions_dropped"]:
+        print(
+            f"Measurement retention: {result['days_rolled_up']} station-days rolled up, "
+            f"{len(result['partitions_dropped'])} partitions dropped, {result['rows_deleted']} rows deleted"
+        )
+    return result
+
+measurement_maintenance_task = PeriodicTask(
+    "measurement-maintenance",
+    settings.MEASUREMENT_MAINTENANCE_INTERVAL_SECONDS,
+    run_measurement_maintenance,
+    align_to_interval=True
+)
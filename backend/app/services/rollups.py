@@ -0,0 +1,138 @@
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import delete, select, tuple_
+
+from app.db.bulk import chunked, dialect_insert, sql_add, sql_greatest
+from app.db.models import AqiRollup
+
+SCOPES = ("station", "city")
+PERIODS = ("hour", "day", "month")
+EXCEEDANCE_LEVELS = (100, 150, 200)
+
+def bucket_start(timestamps, period):
+    """Truncate a datetime Series to the start of its hour, day or month"""
+    if period == "month":
+        return timestamps.dt.to_period("M").dt.to_timestamp()
+    return timestamps.dt.floor("h" if period == "hour" else "D")
+
+def rollup_deltas(frame):
+    """
+    Aggregate new readings into per-bucket deltas for every scope and period.
+
+    frame needs station_id, city, measured_at, pm25 and aqi columns. Each
+    reading contributes to six rows (station/city x hour/day/month), so a
+    batch is grouped once per combination rather than row by row.
+    """
+    if frame.empty:
+        return []
+    frame = frame.assign(
+        measured_at=pd.to_datetime(frame["measured_at"]),
+        pm25=pd.to_numeric(frame["pm25"], errors="coerce"),
+        aqi=pd.to_numeric(frame["aqi"], errors="coerce"),
+    )
+    for level in EXCEEDANCE_LEVELS:
+        frame[f"over_{level}"] = (frame["aqi"] > level).astype(int)
+
+    deltas = []
+    for period in PERIODS:
+        frame["bucket"] = bucket_start(frame["measured_at"], period)
+        for scope, key in (("station", "station_id"), ("city", "city")):
+            grouped = frame.groupby([key, "bucket"]).agg(
+                samples=("pm25", "size"),
+                pm25_count=("pm25", "count"),
+                pm25_sum=("pm25", "sum"),
+                pm25_max=("pm25", "max"),
+                aqi_count=("aqi", "count"),
+                aqi_sum=("aqi", "sum"),
+                aqi_max=("aqi", "max"),
+                **{f"over_{level}": (f"over_{level}", "sum") for level in EXCEEDANCE_LEVELS}
+            ).reset_index()
+            grouped = grouped.rename(columns={key: "scope_id"}).assign(scope=scope, period=period)
+            deltas.extend(grouped.astype(object).where(grouped.notna(), None).to_dict("records"))
+    for delta in deltas:
+        for column in ("samples", "pm25_count", "aqi_count", *(f"over_{level}" for level in EXCEEDANCE_LEVELS)):
+            delta[column] = int(delta[column])
+        if delta["aqi_max"] is not None:
+            delta["aqi_max"] = int(delta["aqi_max"])
+    return deltas
+
+def apply_rollups(conn, frame):
+    """
+    Add a batch of newly stored readings to aqi_rollups. Rows are only ever
+    incremented, so this must run once per reading, in the same transaction
+    that stores it.
+    """
+    deltas = rollup_deltas(frame)
+    if not deltas:
+        return 0
+
+    rollups = AqiRollup.__table__
+    stmt = dialect_insert(conn, rollups)
+    counters = ("samples", "pm25_count", "aqi_count", *(f"over_{level}" for level in EXCEEDANCE_LEVELS))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["scope", "period", "scope_id", "bucket"],
+        set_={
+            **{column: rollups.c[column] + stmt.excluded[column] for column in counters},
+            "pm25_sum": sql_add(rollups.c.pm25_sum, stmt.excluded.pm25_sum),
+            "pm25_max": sql_greatest(conn, rollups.c.pm25_max, stmt.excluded.pm25_max),
+            "aqi_sum": sql_add(rollups.c.aqi_sum, stmt.excluded.aqi_sum),
+            "aqi_max": sql_greatest(conn, rollups.c.aqi_max, stmt.excluded.aqi_max),
+        }
+    )
+    for chunk in chunked(deltas, 5000):
+        conn.execute(stmt, chunk)
+    return len(deltas)
+
+def clear_rollups(conn):
+    conn.execute(delete(AqiRollup))
+
+def query_rollups(db, scope, period, start, end, scope_id=None, cursor=None, limit=1000):
+    """
+    One page of rollup buckets in [start, end], ordered by (scope_id, bucket).
+
+    cursor is the (scope_id, bucket) of the last row of the previous page;
+    next_cursor is set whenever more rows remain, so a window that spans
+    many cities or stations is paged instead of cut off.
+    """
+    query = select(AqiRollup).where(
+        AqiRollup.scope == scope,
+        AqiRollup.period == period,
+        AqiRollup.bucket >= start,
+        AqiRollup.bucket <= end
+    )
+    if scope_id is not None:
+        query = query.where(AqiRollup.scope_id == scope_id)
+    if cursor is not None:
+        query = query.where(tuple_(AqiRollup.scope_id, AqiRollup.bucket) > tuple_(*cursor))
+    rows = db.execute(
+        query.order_by(AqiRollup.scope_id, AqiRollup.bucket).limit(limit + 1)
+    ).scalars().all()
+    data = [
+        {
+            "id": row.scope_id,
+            "timestamp": row.bucket.isoformat(),
+            "samples": row.samples,
+            "pm25": round(row.pm25_sum / row.pm25_count, 1) if row.pm25_count else None,
+            "pm25_max": round(row.pm25_max, 1) if row.pm25_max is not None else None,
+            "aqi": int(round(row.aqi_sum / row.aqi_count)) if row.aqi_count else None,
+            "aqi_max": row.aqi_max,
+            **{f"over_{level}": getattr(row, f"over_{level}") for level in EXCEEDANCE_LEVELS}
+        }
+        for row in rows[:limit]
+    ]
+    last = rows[limit - 1] if len(rows) > limit else None
+    return {
+        "data": data,
+        "next_cursor": encode_cursor(last.scope_id, last.bucket) if last else None
+    }
+
+def encode_cursor(scope_id, bucket):
+    return f"{scope_id}|{bucket.isoformat()}"
+
+def decode_cursor(cursor):
+    """(scope_id, bucket) from a next_cursor; raises ValueError if malformed"""
+    scope_id, separator, bucket = cursor.rpartition("|")
+    if not separator:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return scope_id, datetime.fromisoformat(bucket)
@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+class PeriodicTask:
+    """
+    Runs an async job on a fixed interval inside the app's event loop
+    """
+    def __init__(self, name, interval_seconds, job, align_to_interval=False):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.job = job
+        self.align_to_interval = align_to_interval
+        self.last_run_at = None
+        self.last_error = None
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _seconds_until_next_run(self):
+        if not self.align_to_interval:
+            return self.interval_seconds
+        # Sleep until the next wall-clock boundary (e.g. top of the hour)
+        return self.interval_seconds - (time.time() % self.interval_seconds)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.job()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"{self.name} failed: {e}")
+            self.last_run_at = time.time()
+            await asyncio.sleep(self._seconds_until_next_run())
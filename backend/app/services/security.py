@@ -1,9 +1,15 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.services.cache import TTLCache
+import asyncio
 import hashlib
+import multiprocessing
 import secrets
+import time
+import uuid
 
 # Fallback to SHA256 if bcrypt has issues
 pwd_context = CryptContext(
@@ -31,12 +37,167 @@ def get_password_hash_fallback(password):
     salt = "cleanairpk_salt_2024"  # In production, use a random salt per user
     return hashlib.sha256(f"{password}{salt}".encode()).hexdigest()
 
+class HashPoolBusy(Exception):
+    """Raised when too many password hashes are already queued"""
+
+# Password hashing is deliberately slow (30k sha256_crypt rounds), so it runs
+# on a bounded worker pool instead of the event loop
+_hash_executor = None
+_hash_semaphore = None
+_hash_stats = {"waiting": 0, "in_flight": 0, "completed": 0, "failed": 0, "rejected": 0}
+
+def _get_hash_executor():
+    global _hash_executor
+    if _hash_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            # passlib's sha256_crypt holds the GIL, so processes scale across
+            # cores. Workers are started from a clean process rather than
+            # forked from one running the event loop, DB pools and HTTP threads.
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _hash_executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context(start_method)
+            )
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix="password-hash"
+            )
+    return _hash_executor
+
+async def _run_hashing(func, *args):
+    global _hash_semaphore
+    if _hash_semaphore is None:
+        _hash_semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS)
+    if _hash_stats["waiting"] >= settings.PASSWORD_HASH_MAX_QUEUE:
+        _hash_stats["rejected"] += 1
+        raise HashPoolBusy()
+
+    _hash_stats["waiting"] += 1
+    try:
+        await _hash_semaphore.acquire()
+    finally:
+        _hash_stats["waiting"] -= 1
+
+    _hash_stats["in_flight"] += 1
+    succeeded = False
+    try:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(_get_hash_executor(), func, *args)
+        succeeded = True
+        return result
+    finally:
+        _hash_stats["in_flight"] -= 1
+        # Errors and cancellations (e.g. the client went away) are failures
+        _hash_stats["completed" if succeeded else "failed"] += 1
+        _hash_semaphore.release()
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await _run_hashing(get_password_hash, password)
+
+def hash_pool_stats():
+    return dict(_hash_stats)
+
+def start_hash_pool():
+    """Create the hashing pool at startup instead of on the first login"""
+    _get_hash_executor()
+
+def shutdown_hash_pool():
+    global _hash_executor, _hash_semaphore
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True, cancel_futures=True)
+        _hash_executor = None
+    _hash_semaphore = None
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # jti lets a single token be revoked before it expires
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+def token_claims(user, profile=None):
+    """
+    Claims embedded in tokens when AUTH_EMBED_CLAIMS is on, so requests can
+    be authorized without loading the user or profile
+    """
+    claims = {"sub": user.id}
+    if settings.AUTH_EMBED_CLAIMS:
+        claims.update({
+            "email": user.email,
+            "name": user.full_name,
+            "act": bool(user.is_active) if user.is_active is not None else True,
+            "pid": profile.id if profile else None,
+            "thr": profile.alert_threshold if profile else None,
+            "tv": profile_version(user.id)
+        })
+    return claims
+
+# Verified tokens keyed by sha256(token); entries are also checked against
+# the token's own exp on every hit
+verified_token_cache = TTLCache(
+    "verified-tokens",
+    ttl_seconds=settings.AUTH_TOKEN_CACHE_SECONDS,
+    max_entries=settings.AUTH_TOKEN_CACHE_MAX_ENTRIES
+)
+
+def token_cache_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+# jti -> exp (unix seconds) of revoked tokens that haven't expired yet
+_revoked_tokens = {}
+
+def revoke_token(jti, exp):
+    now = time.time()
+    for expired in [k for k, v in _revoked_tokens.items() if v <= now]:
+        del _revoked_tokens[expired]
+    _revoked_tokens[jti] = exp
+
+def is_token_revoked(jti):
+    return jti in _revoked_tokens
+
+# Bumped whenever a user's profile changes in this process, so tokens and
+# cache entries that carry an older copy of the profile claims are re-read
+# from the database. Seeded from the start time so claims issued by a
+# previous process never match.
+#
+# A bump only has to outlive the tokens issued before it, so entries expire
+# after a token lifetime. When one is evicted early for space the default
+# version moves past it: every older token then takes the database path,
+# which is slower but never stale.
+_default_version = time.time_ns()
+
+def _raise_default_version(user_id, version):
+    global _default_version
+    _default_version = max(_default_version, version)
+
+_profile_versions = TTLCache(
+    "profile-versions",
+    ttl_seconds=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    max_entries=settings.AUTH_PROFILE_VERSIONS_MAX_ENTRIES,
+    on_evict=_raise_default_version
+)
+
+def profile_version(user_id):
+    return _profile_versions.get(user_id, _default_version)
+
+def bump_profile_version(user_id):
+    _profile_versions.set(user_id, time.time_ns())
+    account_state_cache.invalidate(user_id)
+
+# user_id -> (is_active, profile_id, alert_threshold) as last read from the
+# database. Profile versions are per process, so this is what bounds how
+# long a deactivation or profile change made through another worker (or
+# directly in the database) goes unnoticed: AUTH_ACCOUNT_RECHECK_SECONDS.
+account_state_cache = TTLCache(
+    "account-state",
+    ttl_seconds=settings.AUTH_ACCOUNT_RECHECK_SECONDS,
+    max_entries=settings.AUTH_TOKEN_CACHE_MAX_ENTRIES
+)
@@ -0,0 +1,42 @@
+from functools import lru_cache
+
+import orjson
+from pydantic import BaseModel, TypeAdapter
+
+# Shape of a current AQI snapshot, shared by /api/aqi/current and the
+# ingestion job that pre-serializes each snapshot
+
+class Reading(BaseModel):
+    station_id: str
+    station_name: str | None = None
+    city: str | None = None
+    latitude: float
+    longitude: float
+    pm25: float | None = None
+    pm10: float | None = None
+    aqi: int | None = None
+    last_updated: str | None = None
+    distance_km: float | None = None
+
+class CurrentAqi(BaseModel):
+    data: list[Reading]
+    source: str | None = None
+    ingested_at: str | None = None
+
+@lru_cache(maxsize=None)
+def _adapter(model):
+    return TypeAdapter(model)
+
+def encode_body(data, model=None):
+    """
+    JSON bytes for a payload. With a response model the payload is
+    validated and dumped by pydantic-core (ORM rows included); bytes
+    are passed through as already encoded.
+    """
+    if isinstance(data, bytes):
+        return data
+    if model is not None:
+        adapter = _adapter(model)
+        return adapter.dump_json(adapter.validate_python(data, from_attributes=True), exclude_unset=True)
+    # Same options as ORJSONResponse
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
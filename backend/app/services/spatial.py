@@ -0,0 +1,210 @@
+import asyncio
+import math
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.models import Station
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Great-circle distance from one point to arrays of points"""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+class StationIndex:
+    """
+    Uniform latitude/longitude grid over anything with "latitude" and
+    "longitude" keys (stations or readings).
+
+    A lookup visits grid cells in rings around the query point and stops as
+    soon as no unvisited cell can hold anything closer, so its cost depends
+    on local station density rather than the total number of stations.
+    Doesn't wrap around the antimeridian.
+    """
+    def __init__(self, items, cell_degrees=0.5):
+        self.items = list(items)
+        self.cell_degrees = cell_degrees
+        self.latitudes = np.array([item["latitude"] for item in self.items], dtype=float)
+        self.longitudes = np.array([item["longitude"] for item in self.items], dtype=float)
+
+        rows = np.floor(self.latitudes / cell_degrees).astype(int)
+        cols = np.floor(self.longitudes / cell_degrees).astype(int)
+        cells = {}
+        for index, cell in enumerate(zip(rows.tolist(), cols.tolist())):
+            cells.setdefault(cell, []).append(index)
+        self.cells = {cell: np.array(indices) for cell, indices in cells.items()}
+        if self.items:
+            self.bounds = (rows.min(), rows.max(), cols.min(), cols.max())
+
+    def __len__(self):
+        return len(self.items)
+
+    def _cell(self, latitude, longitude):
+        return math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees)
+
+    def _ring(self, row, col, radius):
+        if radius == 0:
+            yield row, col
+            return
+        for c in range(col - radius, col + radius + 1):
+            yield row - radius, c
+            yield row + radius, c
+        for r in range(row - radius + 1, row + radius):
+            yield r, col - radius
+            yield r, col + radius
+
+    def _ring_clearance_km(self, latitude, radius):
+        """Lower bound on the distance to any cell outside the first radius + 1 rings"""
+        widest = min(90.0, abs(latitude) + (radius + 1) * self.cell_degrees)
+        return radius * self.cell_degrees * KM_PER_DEGREE * math.cos(math.radians(widest))
+
+    def query(self, latitude, longitude, n=None, radius_km=None):
+        """
+        Indices and distances (km) of the n nearest items, optionally only
+        those within radius_km, closest first. n=None returns everything in
+        the radius.
+        """
+        if not self.items or (n is None and radius_km is None):
+            return np.empty(0, dtype=int), np.empty(0)
+
+        row, col = self._cell(latitude, longitude)
+        min_row, max_row, min_col, max_col = self.bounds
+        # Rings that can't reach the grid's extent are skipped outright
+        ring = max(0, min_row - row, row - max_row, min_col - col, col - max_col)
+        last_ring = max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col))
+
+        found = []
+        indices = np.empty(0, dtype=int)
+        distances = np.empty(0)
+        while ring <= last_ring:
+            if 8 * ring > len(self.cells):
+                # Far from the stations the rings are mostly empty; checking
+                # every item is cheaper than walking them
+                indices = np.arange(len(self.items))
+                distances = haversine_km(latitude, longitude, self.latitudes, self.longitudes)
+                break
+            new = [self.cells[cell] for cell in self._ring(row, col, ring) if cell in self.cells]
+            if new:
+                found.extend(new)
+                indices = np.concatenate(found)
+                distances = haversine_km(latitude, longitude, self.latitudes[indices], self.longitudes[indices])
+            clearance = self._ring_clearance_km(latitude, ring)
+            if radius_km is not None and clearance > radius_km:
+                break
+            if n is not None and len(indices) >= n and np.partition(distances, n - 1)[n - 1] <= clearance:
+                break
+            ring += 1
+
+        if radius_km is not None:
+            inside = distances <= radius_km
+            indices, distances = indices[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        if n is not None:
+            order = order[:n]
+        return indices[order], distances[order]
+
+    def nearest(self, latitude, longitude, n=5, radius_km=None):
+        """[(item, distance_km)] for the n nearest items"""
+        indices, distances = self.query(latitude, longitude, n, radius_km)
+        return [(self.items[i], float(d)) for i, d in zip(indices.tolist(), distances.tolist())]
+
+    def within(self, latitude, longitude, radius_km):
+        return self.nearest(latitude, longitude, None, radius_km)
+
+    def interpolate(self, latitude, longitude, values, n=8, power=2.0, radius_km=None):
+        """
+        Inverse-distance-weighted estimate at a point from the n nearest
+        items. values is aligned with the items. Returns (value, neighbors)
+        with value None when there is nothing in range.
+        """
+        indices, distances = self.query(latitude, longitude, n, radius_km)
+        neighbors = [(self.items[i], float(d)) for i, d in zip(indices.tolist(), distances.tolist())]
+        if len(indices) == 0:
+            return None, neighbors
+        if distances[0] < 1e-3:
+            # Standing on a station: use its reading as-is
+            return float(values[indices[0]]), neighbors[:1]
+        weights = 1.0 / distances ** power
+        return float(np.sum(weights * values[indices]) / np.sum(weights)), neighbors
+
+# Active stations, rebuilt when ingestion adds stations or after the TTL so
+# changes made by other processes are picked up
+_station_index = None
+_station_index_built_at = 0.0
+_station_index_stale = True
+_station_index_lock = None
+_stations_version = 0
+
+def invalidate_station_index():
+    global _station_index_stale, _stations_version
+    _station_index_stale = True
+    _stations_version += 1
+
+def get_stations_version():
+    """
+    Changes whenever this process adds stations, and at least every index
+    TTL so changes made elsewhere are eventually seen
+    """
+    return _stations_version, int(time.time() // settings.SPATIAL_INDEX_TTL_SECONDS)
+
+async def get_station_index(db):
+    global _station_index, _station_index_built_at, _station_index_stale, _station_index_lock
+
+    def fresh():
+        return (
+            _station_index is not None
+            and not _station_index_stale
+            and time.monotonic() - _station_index_built_at < settings.SPATIAL_INDEX_TTL_SECONDS
+        )
+
+    if fresh():
+        return _station_index
+    if _station_index_lock is None:
+        _station_index_lock = asyncio.Lock()
+    async with _station_index_lock:
+        if not fresh():
+            _station_index_stale = False
+            rows = (await db.execute(
+                select(Station.id, Station.name, Station.city, Station.latitude, Station.longitude)
+                .where(Station.is_active == True)
+            )).all()
+            _station_index = StationIndex(
+                [
+                    {"id": id, "name": name, "city": city, "latitude": latitude, "longitude": longitude}
+                    for id, name, city, latitude, longitude in rows
+                ],
+                settings.SPATIAL_INDEX_CELL_DEGREES
+            )
+            _station_index_built_at = time.monotonic()
+    return _station_index
+
+# Readings of the snapshot last queried; snapshots are replaced rather than
+# mutated, so identity tells whether the index is current
+_readings_snapshot = None
+_readings_index = None
+_readings_pm25 = None
+
+def get_readings_index(snapshot):
+    """Index over a snapshot's readings that have coordinates and PM2.5, with their PM2.5 values"""
+    global _readings_snapshot, _readings_index, _readings_pm25
+    if snapshot is not _readings_snapshot:
+        readings = [
+            reading for reading in snapshot.get("data", [])
+            if reading.get("latitude") is not None
+            and reading.get("longitude") is not None
+            and reading.get("pm25") is not None
+        ]
+        _readings_index = StationIndex(readings, settings.SPATIAL_INDEX_CELL_DEGREES)
+        _readings_pm25 = np.array([reading["pm25"] for reading in readings], dtype=float)
+        _readings_snapshot = snapshot
+    return _readings_index, _readings_pm25
@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import math
+import struct
+import zlib
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.aqi_index import calculate_aqi
+from app.services.cache import TTLCache
+from app.services.spatial import KM_PER_DEGREE
+
+TILE_SIZE = 256
+TILE_FORMATS = {"png": "image/png", "f16": "application/octet-stream"}
+
+# Upper AQI bound and RGB of each category, matching the map legend
+AQI_COLORS = (
+    (50, (34, 197, 94)),
+    (100, (234, 179, 8)),
+    (150, (249, 115, 22)),
+    (200, (239, 68, 68)),
+    (300, (168, 85, 247)),
+    (math.inf, (153, 27, 27)),
+)
+OVERLAY_ALPHA = 150
+
+class AqiGrid:
+    """
+    PM2.5 interpolated onto a regular lat/lon grid covering the stations
+    (padded by the interpolation radius). Cells farther than the radius from
+    every station are NaN.
+    """
+    def __init__(self, pm25, south, west, degrees):
+        self.pm25 = pm25
+        self.south = south
+        self.west = west
+        self.degrees = degrees
+        self.etag = hashlib.blake2b(
+            pm25.tobytes() + struct.pack("<3d", south, west, degrees), digest_size=12
+        ).hexdigest()
+
+    def sample(self, latitudes, longitudes):
+        """Nearest-cell PM2.5 at each point, NaN outside the grid"""
+        latitudes, longitudes = np.broadcast_arrays(latitudes, longitudes)
+        rows = np.floor((latitudes - self.south) / self.degrees).astype(int)
+        cols = np.floor((longitudes - self.west) / self.degrees).astype(int)
+        height, width = self.pm25.shape
+        inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+        values = np.full(rows.shape, np.nan, dtype=np.float32)
+        values[inside] = self.pm25[rows[inside], cols[inside]]
+        return values
+
+def build_grid(latitudes, longitudes, pm25, degrees, radius_km, power):
+    """
+    Inverse-distance-weighted PM2.5 grid. Each station only contributes to
+    cells within radius_km, so the cost grows with the number of stations
+    rather than stations x cells.
+    """
+    if len(pm25) == 0:
+        return None
+    pad = radius_km / KM_PER_DEGREE
+    south = math.floor((latitudes.min() - pad) / degrees) * degrees
+    west = math.floor((longitudes.min() - pad) / degrees) * degrees
+    height = int(math.ceil((latitudes.max() + pad - south) / degrees)) + 1
+    width = int(math.ceil((longitudes.max() + pad - west) / degrees)) + 1
+    cell_latitudes = south + (np.arange(height) + 0.5) * degrees
+
+    weighted = np.zeros((height, width))
+    weights = np.zeros((height, width))
+    reach_rows = int(math.ceil(pad / degrees))
+    for latitude, longitude, value in zip(latitudes.tolist(), longitudes.tolist(), pm25.tolist()):
+        row = int((latitude - south) / degrees)
+        col = int((longitude - west) / degrees)
+        # Longitude degrees shrink towards the poles, so the window widens
+        cos_lat = max(math.cos(math.radians(min(89.0, abs(latitude) + pad))), 1e-3)
+        reach_cols = int(math.ceil(pad / cos_lat / degrees))
+        r0, r1 = max(0, row - reach_rows), min(height, row + reach_rows + 1)
+        c0, c1 = max(0, col - reach_cols), min(width, col + reach_cols + 1)
+
+        # Equirectangular distance is accurate enough at this scale
+        dy = (cell_latitudes[r0:r1, None] - latitude) * KM_PER_DEGREE
+        dx = (west + (np.arange(c0, c1) + 0.5) * degrees - longitude) * KM_PER_DEGREE * math.cos(math.radians(latitude))
+        distance = np.hypot(dy, dx[None, :])
+        # Floor the distance so a station's own cell doesn't get infinite weight
+        weight = np.where(distance <= radius_km, 1.0 / np.maximum(distance, degrees * KM_PER_DEGREE / 4) ** power, 0.0)
+        weighted[r0:r1, c0:c1] += weight * value
+        weights[r0:r1, c0:c1] += weight
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        grid = np.where(weights > 0, weighted / weights, np.nan).astype(np.float32)
+    return AqiGrid(grid, south, west, degrees)
+
+def tile_coordinates(z, x, y):
+    """Latitude and longitude of each pixel centre of a web-mercator tile"""
+    scale = TILE_SIZE * 2 ** z
+    pixels = np.arange(TILE_SIZE) + 0.5
+    longitudes = (x * TILE_SIZE + pixels) / scale * 360.0 - 180.0
+    mercator = math.pi * (1 - 2 * (y * TILE_SIZE + pixels) / scale)
+    latitudes = np.degrees(np.arctan(np.sinh(mercator)))
+    return latitudes[:, None], longitudes[None, :]
+
+def encode_png(rgba):
+    """Minimal RGBA PNG encoder (unfiltered scanlines, zlib-deflated)"""
+    height, width, _ = rgba.shape
+    scanlines = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(scanlines.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
+
+def colorize(aqi):
+    rgba = np.zeros(aqi.shape + (4,), dtype=np.uint8)
+    lower = -math.inf
+    for upper, color in AQI_COLORS:
+        band = (aqi > lower) & (aqi <= upper)
+        rgba[band] = (*color, OVERLAY_ALPHA)
+        lower = upper
+    return rgba
+
+def render_tile(grid, z, x, y, fmt):
+    """
+    AQI tile bytes: a colored PNG overlay, or "f16" with the raw AQI values
+    as a little-endian float16 256x256 array (NaN where there's no data)
+    """
+    if grid is None:
+        aqi = np.full((TILE_SIZE, TILE_SIZE), np.nan)
+    else:
+        latitudes, longitudes = tile_coordinates(z, x, y)
+        aqi = calculate_aqi(grid.sample(latitudes, longitudes), "pm25")
+    if fmt == "f16":
+        return aqi.astype("<f2").tobytes()
+    return encode_png(colorize(aqi))
+
+# Grid of the snapshot last rendered; snapshots are replaced rather than
+# mutated, so identity tells whether it's current
+_grid_snapshot = None
+_grid = None
+_grid_lock = None
+
+tile_cache = TTLCache("aqi-tiles", settings.TILE_CACHE_TTL_SECONDS, max_entries=settings.TILE_CACHE_MAX_ENTRIES)
+
+def get_grid(snapshot):
+    global _grid_snapshot, _grid
+    if snapshot is not _grid_snapshot:
+        readings = [
+            reading for reading in snapshot.get("data", [])
+            if reading.get("latitude") is not None
+            and reading.get("longitude") is not None
+            and reading.get("pm25") is not None
+        ]
+        _grid = build_grid(
+            np.array([reading["latitude"] for reading in readings], dtype=float),
+            np.array([reading["longitude"] for reading in readings], dtype=float),
+            np.array([reading["pm25"] for reading in readings], dtype=float),
+            settings.TILE_GRID_DEGREES,
+            settings.TILE_IDW_RADIUS_KM,
+            settings.IDW_POWER
+        )
+        _grid_snapshot = snapshot
+    return _grid
+
+async def load_grid(snapshot):
+    """
+    Grid for snapshot, interpolated off the event loop when it has changed.
+    The map requests dozens of tiles at once, so they wait on one build.
+    """
+    global _grid_lock
+    if snapshot is _grid_snapshot:
+        return _grid
+    if _grid_lock is None:
+        _grid_lock = asyncio.Lock()
+    async with _grid_lock:
+        if snapshot is _grid_snapshot:
+            return _grid
+        return await asyncio.to_thread(get_grid, snapshot)
+
+def tile_etag(grid, z, x, y, fmt):
+    return f'"{grid.etag if grid is not None else "empty"}-{z}-{x}-{y}-{fmt}"'
+
+async def get_tile(grid, z, x, y, fmt):
+    """Tile bytes, rendered once per grid; concurrent misses share one render"""
+    return await tile_cache.get_or_load(
+        tile_etag(grid, z, x, y, fmt),
+        lambda: asyncio.to_thread(render_tile, grid, z, x, y, fmt)
+    )
@@ -74,6 +74,63 @@ def init_database():
                 FOREIGN KEY (station_id) REFERENCES stations (id)
             )
         ''')
+
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS ix_measurements_station_measured_at
+            ON measurements (station_id, measured_at)
+        ''')
+
+        # Compact storage (MEASUREMENT_STORAGE=compact) and its daily rollups
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS measurement_readings (
+                station_id TEXT NOT NULL,
+                measured_at DATETIME NOT NULL,
+                pm25 REAL,
+                pm10 REAL,
+                aqi SMALLINT,
+                PRIMARY KEY (station_id, measured_at),
+                FOREIGN KEY (station_id) REFERENCES stations (id)
+            ) WITHOUT ROWID
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS measurement_daily (
+                station_id TEXT NOT NULL,
+                day DATETIME NOT NULL,
+                samples INTEGER NOT NULL,
+                pm25_count INTEGER NOT NULL,
+                pm25_sum REAL,
+                pm25_min REAL,
+                pm25_max REAL,
+                pm10_count INTEGER NOT NULL,
+                pm10_sum REAL,
+                aqi_sum REAL,
+                aqi_max INTEGER,
+                PRIMARY KEY (station_id, day),
+                FOREIGN KEY (station_id) REFERENCES stations (id)
+            ) WITHOUT ROWID
+        ''')
+
+        # Incrementally maintained statistics behind /api/aqi/stats
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS aqi_rollups (
+                scope TEXT NOT NULL,
+                period TEXT NOT NULL,
+                scope_id TEXT NOT NULL,
+                bucket DATETIME NOT NULL,
+                samples INTEGER NOT NULL,
+                pm25_count INTEGER NOT NULL,
+                pm25_sum REAL,
+                pm25_max REAL,
+                aqi_count INTEGER NOT NULL,
+                aqi_sum REAL,
+                aqi_max INTEGER,
+                over_100 INTEGER NOT NULL,
+                over_150 INTEGER NOT NULL,
+                over_200 INTEGER NOT NULL,
+                PRIMARY KEY (scope, period, scope_id, bucket)
+            ) WITHOUT ROWID
+        ''')
         
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS forecasts (
@@ -87,6 +144,11 @@ def init_database():
                 FOREIGN KEY (station_id) REFERENCES stations (id)
             )
         ''')
+
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS ix_forecasts_station_forecasted_for
+            ON forecasts (station_id, forecasted_for)
+        ''')
         
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS alerts (
@@ -95,10 +157,33 @@ def init_database():
                 message TEXT NOT NULL,
                 aqi_level INTEGER,
                 is_read BOOLEAN DEFAULT 0,
+                kind TEXT,
+                city TEXT,
+                station_id TEXT,
+                dedup_key TEXT,
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
         ''')
+
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS ix_alerts_dedup_key ON alerts (dedup_key)
+        ''')
+
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS ix_alerts_user_created_at
+            ON alerts (user_id, created_at)
+        ''')
+
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS ix_alerts_user_city_created_at
+            ON alerts (user_id, city, created_at)
+        ''')
+
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS ix_alerts_user_read_created_at
+            ON alerts (user_id, is_read, created_at)
+        ''')
         
         conn.commit()
         print("✓ Database tables created via direct SQL")
@@ -0,0 +1,327 @@
+import sys
+import os
+import argparse
+import csv
+import io
+import time
+import uuid
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from app.db.bulk import dialect_insert
+from app.db.models import BackfillCheckpoint, Station
+from app.db.session import engine
+from app.db.storage import STORED_COLUMNS, ensure_partitions, measurement_table, store_measurements
+from app.services.aqi_index import calculate_aqi
+from app.services.rollups import apply_rollups
+
+# Header names accepted for each field, in order of preference. Station ids
+# default to the location name, which is what live ingestion uses.
+COLUMN_ALIASES = {
+    "station_id": ("station_id", "location", "location_id"),
+    "station_name": ("station_name", "location", "location_id"),
+    "city": ("city",),
+    "latitude": ("latitude", "lat", "coordinates.latitude"),
+    "longitude": ("longitude", "lon", "coordinates.longitude"),
+    "measured_at": ("measured_at", "datetime", "date.utc", "utc"),
+    # Long exports: one row per (location, time, parameter)
+    "parameter": ("parameter",),
+    "value": ("value",),
+    # Wide exports: one row per (location, time)
+    "pm25": ("pm25",),
+    "pm10": ("pm10",),
+}
+POLLUTANTS = ("pm25", "pm10")
+# OpenAQ marks failed readings with -999
+MISSING_VALUE = -999
+
+def resolve_columns(header):
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        columns[field] = next((alias for alias in aliases if alias in header), None)
+    if columns["station_id"] is None or columns["measured_at"] is None:
+        raise SystemExit(f"Source needs a station and a timestamp column, got: {', '.join(header)}")
+    if columns["parameter"] and columns["value"]:
+        columns["layout"] = "long"
+    elif columns["pm25"] or columns["pm10"]:
+        columns["layout"] = "wide"
+    else:
+        raise SystemExit("Source needs either parameter/value or pm25/pm10 columns")
+    return columns
+
+def read_csv_chunks(path, batch_size, skip_rows):
+    header = pd.read_csv(path, nrows=0).columns.tolist()
+    reader = pd.read_csv(
+        path,
+        chunksize=batch_size,
+        skiprows=range(1, skip_rows + 1) if skip_rows else None,
+        dtype={name: str for name in ("location", "location_id", "station_id", "city")}
+    )
+    return header, reader
+
+def read_parquet_chunks(path, batch_size, skip_rows):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Reading Parquet requires pyarrow: pip install pyarrow")
+
+    parquet = pq.ParquetFile(path)
+    header = parquet.schema_arrow.names
+
+    # Skip whole row groups from the metadata, then trim the first batch
+    row_groups = []
+    offset = skip_rows
+    for index in range(parquet.num_row_groups):
+        group_rows = parquet.metadata.row_group(index).num_rows
+        if not row_groups and offset >= group_rows:
+            offset -= group_rows
+            continue
+        row_groups.append(index)
+
+    def batches():
+        remaining = offset
+        for batch in parquet.iter_batches(batch_size=batch_size, row_groups=row_groups):
+            frame = batch.to_pandas()
+            if remaining:
+                frame = frame.iloc[remaining:]
+                remaining = 0
+            yield frame
+
+    return header, batches() if row_groups else iter(())
+
+def normalize(chunk, columns, default_city):
+    """Map a raw chunk to one wide row per (station_id, measured_at)"""
+    frame = pd.DataFrame({
+        "station_id": chunk[columns["station_id"]].astype(str),
+        "measured_at": pd.to_datetime(chunk[columns["measured_at"]], utc=True, format="ISO8601").dt.tz_localize(None),
+    })
+    for field in ("station_name", "city", "latitude", "longitude"):
+        frame[field] = chunk[columns[field]] if columns[field] else None
+    frame["station_name"] = frame["station_name"].fillna(frame["station_id"]).astype(str)
+    frame["city"] = frame["city"].fillna(default_city)
+
+    if columns["layout"] == "long":
+        frame["parameter"] = chunk[columns["parameter"]].astype(str).str.lower().str.replace(".", "", regex=False)
+        frame["value"] = pd.to_numeric(chunk[columns["value"]], errors="coerce")
+        frame = frame[frame["parameter"].isin(POLLUTANTS)]
+        values = (
+            frame.groupby(["station_id", "measured_at", "parameter"])["value"]
+            .mean()
+            .unstack("parameter")
+            .reindex(columns=list(POLLUTANTS))
+            .reset_index()
+        )
+        stations = frame.drop_duplicates("station_id")
+    else:
+        for pollutant in POLLUTANTS:
+            frame[pollutant] = pd.to_numeric(chunk[columns[pollutant]], errors="coerce") if columns[pollutant] else np.nan
+        values = frame.groupby(["station_id", "measured_at"], as_index=False)[list(POLLUTANTS)].mean()
+        stations = frame.drop_duplicates("station_id")
+
+    for pollutant in POLLUTANTS:
+        values[pollutant] = values[pollutant].mask(values[pollutant] <= MISSING_VALUE)
+    values = values.dropna(subset=list(POLLUTANTS), how="all")
+    return stations, values
+
+def to_measurements(values, table):
+    aqi = calculate_aqi(values["pm25"].to_numpy(dtype=float), "pm25")
+    measurements = pd.DataFrame({
+        "station_id": values["station_id"].to_numpy(),
+        "pm25": values["pm25"].to_numpy(dtype=float),
+        "pm10": values["pm10"].to_numpy(dtype=float),
+        "aqi": pd.array(aqi, dtype="Int64"),
+        "measured_at": values["measured_at"].to_numpy(),
+    })
+    if "id" in table.c:
+        # Legacy storage keys rows on a UUID
+        measurements.insert(0, "id", [str(uuid.uuid4()) for _ in range(len(measurements))])
+    return measurements
+
+def new_station_rows(stations, station_cities, skipped_ids):
+    rows = []
+    for station in stations.itertuples(index=False):
+        if station.station_id in station_cities or station.station_id in skipped_ids:
+            continue
+        if pd.isna(station.latitude) or pd.isna(station.longitude):
+            print(f"Skipping station {station.station_id}: no coordinates")
+            skipped_ids.add(station.station_id)
+            continue
+        station_cities[station.station_id] = station.city
+        rows.append({
+            "id": station.station_id,
+            "name": station.station_name,
+            "city": station.city,
+            "latitude": float(station.latitude),
+            "longitude": float(station.longitude),
+            "is_active": True
+        })
+    return rows
+
+def copy_measurements(conn, table, measurements):
+    """
+    Postgres COPY straight from an in-memory CSV buffer. Returns the rows
+    stored, like store_measurements.
+    """
+    buffer = io.StringIO()
+    measurements.to_csv(buffer, index=False, header=False, na_rep="", quoting=csv.QUOTE_MINIMAL)
+    buffer.seek(0)
+    columns = ", ".join(measurements.columns)
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        if "id" in table.c:
+            cursor.copy_expert(f"COPY {table.name} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+            return measurements[list(STORED_COLUMNS)]
+        else:
+            # COPY can't skip readings that are already stored, so stage
+            # the batch and let INSERT ... ON CONFLICT do it
+            cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS backfill_staging (LIKE {table.name}) ON COMMIT DELETE ROWS")
+            cursor.copy_expert(f"COPY backfill_staging ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(
+                f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM backfill_staging "
+                f"ON CONFLICT DO NOTHING RETURNING {', '.join(STORED_COLUMNS)}"
+            )
+            return pd.DataFrame(cursor.fetchall(), columns=list(STORED_COLUMNS))
+    finally:
+        cursor.close()
+
+def insert_measurements(conn, table, measurements, insert_size):
+    records = measurements.astype(object).where(measurements.notna(), None)
+    return store_measurements(conn, records.to_dict("records"), table, insert_size)
+
+def load_checkpoint(conn, key, source_size, restart):
+    row = conn.execute(select(BackfillCheckpoint).where(BackfillCheckpoint.source == key)).first()
+    if restart or row is None:
+        return {"rows_done": 0, "measurements": 0}
+    if row.source_size != source_size:
+        raise SystemExit(f"The checkpoint for {key} was written for a different version of the source; use --restart")
+    return {"rows_done": row.rows_done, "measurements": row.measurements}
+
+def save_checkpoint(conn, key, source_size, rows_done, measurements):
+    """Upsert the source's progress on the connection that stores the batch"""
+    values = {
+        "source": key,
+        "source_size": source_size,
+        "rows_done": rows_done,
+        "measurements": measurements,
+        "updated_at": datetime.utcnow()
+    }
+    stmt = dialect_insert(conn, BackfillCheckpoint.__table__)
+    conn.execute(
+        stmt.on_conflict_do_update(index_elements=["source"], set_={k: stmt.excluded[k] for k in values if k != "source"}),
+        values
+    )
+
+def backfill(source, source_format, batch_size, insert_size, checkpoint_key, restart, use_copy, default_city, update_rollups=True):
+    source_size = os.path.getsize(source)
+    # Normally created by the app's migrations, which may not have run yet
+    BackfillCheckpoint.__table__.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        checkpoint = load_checkpoint(conn, checkpoint_key, source_size, restart)
+    if checkpoint["rows_done"]:
+        print(f"Resuming after {checkpoint['rows_done']} source rows")
+
+    reader = read_parquet_chunks if source_format == "parquet" else read_csv_chunks
+    header, chunks = reader(source, batch_size, checkpoint["rows_done"])
+    columns = resolve_columns(header)
+
+    table = measurement_table()
+    with engine.connect() as conn:
+        station_cities = dict(conn.execute(select(Station.id, Station.city)).all())
+    skipped_ids = set()
+    use_copy = use_copy and engine.dialect.name == "postgresql"
+    station_insert = dialect_insert(engine, Station).on_conflict_do_nothing(index_elements=["id"])
+
+    def load(chunk, rows_read):
+        """Store a chunk and advance the checkpoint by rows_read source rows, atomically"""
+        stations, values = normalize(chunk, columns, default_city)
+        measurements = to_measurements(values, table)
+        stations_added = new_station_rows(stations, station_cities, skipped_ids)
+        # Readings for stations without coordinates can't be stored
+        measurements = measurements[measurements["station_id"].isin(station_cities)]
+        stored_count = 0
+        with engine.begin() as conn:
+            if stations_added:
+                conn.execute(station_insert, stations_added)
+            if len(measurements):
+                # Historical months may predate the partitions made at startup
+                ensure_partitions(conn, measurements["measured_at"].min(), measurements["measured_at"].max(), table)
+                if use_copy:
+                    stored = copy_measurements(conn, table, measurements)
+                else:
+                    stored = insert_measurements(conn, table, measurements, insert_size)
+                # Only readings that weren't already stored count towards the rollups
+                if update_rollups:
+                    apply_rollups(conn, stored.assign(city=stored["station_id"].map(station_cities)))
+                stored_count = len(stored)
+            save_checkpoint(
+                conn, checkpoint_key, source_size,
+                checkpoint["rows_done"] + rows_read, checkpoint["measurements"] + stored_count
+            )
+        checkpoint["rows_done"] += rows_read
+        checkpoint["measurements"] += stored_count
+
+    began = time.perf_counter()
+    carry = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        pending = len(chunk)
+        # In long exports pm25 and pm10 of one reading can straddle a chunk
+        # boundary, so the last (station, time) group waits for the next chunk
+        carry = None
+        if columns["layout"] == "long" and pending:
+            last = chunk.iloc[-1]
+            same_key = (
+                (chunk[columns["station_id"]] == last[columns["station_id"]])
+                & (chunk[columns["measured_at"]] == last[columns["measured_at"]])
+            ).to_numpy()
+            # Only the trailing run, so rows_done below stays a prefix of the source
+            tail = np.flip(np.cumprod(np.flip(same_key))).astype(bool)
+            carry = chunk[tail]
+            chunk = chunk[~tail]
+
+        load(chunk, pending - (len(carry) if carry is not None else 0))
+
+        elapsed = time.perf_counter() - began
+        print(
+            f"{checkpoint['rows_done']} rows read, {checkpoint['measurements']} measurements, "
+            f"{len(station_cities)} stations ({checkpoint['measurements'] / max(elapsed, 1e-9):.0f} measurements/s)"
+        )
+
+    if carry is not None and len(carry):
+        load(carry, len(carry))
+
+    print(f"Done: {checkpoint['measurements']} measurements from {checkpoint['rows_done']} rows")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill stations and measurements from OpenAQ-style CSV or Parquet exports")
+    parser.add_argument("source", help="CSV (optionally compressed) or Parquet file")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=100_000, help="Source rows read per batch")
+    parser.add_argument("--insert-size", type=int, default=5000, help="Rows per executemany call")
+    parser.add_argument("--checkpoint", help="Name progress is kept under in backfill_checkpoints; defaults to the source's absolute path")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--no-copy", action="store_true", help="Use INSERT instead of COPY on Postgres")
+    parser.add_argument("--city", default="Unknown", help="City for rows without one")
+    parser.add_argument(
+        "--skip-rollups", action="store_true",
+        help="Don't update aqi_rollups; run scripts/rebuild_rollups.py afterwards instead"
+    )
+    args = parser.parse_args()
+
+    source_format = args.format or ("parquet" if args.source.endswith((".parquet", ".pq")) else "csv")
+    backfill(
+        args.source,
+        source_format,
+        args.batch_size,
+        args.insert_size,
+        args.checkpoint or os.path.abspath(args.source),
+        args.restart,
+        not args.no_copy,
+        args.city,
+        not args.skip_rollups
+    )
@@ -0,0 +1,106 @@
+import sys
+import os
+import argparse
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from app.db.session import SessionLocal
+from app.services.forecast import MODELS, load_history_frame, recent_hourly_values
+
+def backtest(frame, model_name, test_days, horizon, step_hours):
+    """
+    Rolling-origin backtest: fit on everything before the test window, then
+    forecast from every step_hours origin inside it and score against the
+    observed hourly means
+    """
+    cutoff = frame["measured_at"].max().floor("h") - timedelta(days=test_days)
+    model = MODELS[model_name]().fit(frame[frame["measured_at"] < cutoff])
+
+    series = [
+        (station_id, city)
+        for station_id, city in frame[["station_id", "city"]].drop_duplicates().itertuples(index=False)
+    ]
+    actual = (
+        frame.set_index("measured_at")
+        .groupby("station_id")["pm25"]
+        .resample("h")
+        .mean()
+        .unstack(level=0)
+    )
+
+    errors = {station_id: [] for station_id, _ in series}
+    single_latency = {station_id: [] for station_id, _ in series}
+    batch_latency = []
+
+    origins = pd.date_range(cutoff, frame["measured_at"].max() - timedelta(hours=horizon), freq=f"{step_hours}h")
+    for origin in origins:
+        start = origin.to_pydatetime()
+        recent = recent_hourly_values(frame[frame["measured_at"] < origin], start)
+
+        began = time.perf_counter()
+        predictions = model.predict_batch(series, horizon, start, recent=recent)
+        batch_latency.append(time.perf_counter() - began)
+
+        window = actual.reindex(pd.date_range(start, periods=horizon, freq="h"))
+        for i, (station_id, city) in enumerate(series):
+            began = time.perf_counter()
+            model.predict_batch([(station_id, city)], horizon, start, recent=recent)
+            single_latency[station_id].append(time.perf_counter() - began)
+
+            observed = window[station_id].to_numpy() if station_id in window else np.full(horizon, np.nan)
+            mask = ~np.isnan(observed)
+            if mask.any():
+                errors[station_id].append(np.abs(predictions[i][mask] - observed[mask]).mean())
+
+    return {
+        "origins": len(origins),
+        "batch_ms": 1000 * float(np.mean(batch_latency)) if batch_latency else None,
+        "stations": {
+            station_id: {
+                "mae": float(np.mean(errors[station_id])) if errors[station_id] else None,
+                "latency_ms": 1000 * float(np.mean(single_latency[station_id])) if single_latency[station_id] else None
+            }
+            for station_id, _ in series
+        }
+    }
+
+def print_report(model_name, report):
+    print(f"\n=== {model_name} ({report['origins']} origins) ===")
+    print(f"{'station':<32} {'MAE':>10} {'latency ms':>12}")
+    maes = []
+    for station_id, stats in sorted(report["stations"].items()):
+        mae = f"{stats['mae']:.2f}" if stats["mae"] is not None else "-"
+        latency = f"{stats['latency_ms']:.3f}" if stats["latency_ms"] is not None else "-"
+        print(f"{station_id:<32} {mae:>10} {latency:>12}")
+        if stats["mae"] is not None:
+            maes.append(stats["mae"])
+    if maes:
+        print(f"{'mean':<32} {np.mean(maes):>10.2f}")
+    if report["batch_ms"] is not None:
+        print(f"Batched inference for all stations: {report['batch_ms']:.3f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest forecast models on stored measurements")
+    parser.add_argument("--models", nargs="+", choices=sorted(MODELS), default=sorted(MODELS))
+    parser.add_argument("--days", type=int, default=60, help="Days of history to load")
+    parser.add_argument("--test-days", type=int, default=7)
+    parser.add_argument("--horizon", type=int, default=48)
+    parser.add_argument("--step-hours", type=int, default=24)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        frame = load_history_frame(db, datetime.utcnow() - timedelta(days=args.days))
+    finally:
+        db.close()
+
+    if frame.empty:
+        print("No measurements to backtest on")
+        sys.exit(1)
+
+    for model_name in args.models:
+        print_report(model_name, backtest(frame, model_name, args.test_days, args.horizon, args.step_hours))
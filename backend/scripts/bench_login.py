@@ -0,0 +1,53 @@
+import sys
+import os
+import argparse
+import asyncio
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.services.security import (
+    get_password_hash, verify_password, verify_password_async, shutdown_hash_pool
+)
+
+async def measure_loop_lag(stop, interval=0.005):
+    """Worst delay seen by a coroutine that wants to wake every interval"""
+    worst = 0.0
+    while not stop.is_set():
+        began = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - began - interval)
+    return worst
+
+async def run(verify, clients, logins_per_client, hashed):
+    async def client():
+        for _ in range(logins_per_client):
+            assert await verify("demo123", hashed)
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    began = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - began
+    stop.set()
+    worst_lag = await lag_task
+    return clients * logins_per_client / elapsed, worst_lag
+
+async def verify_inline(plain_password, hashed_password):
+    # What the login handler did before: hash on the event loop
+    return verify_password(plain_password, hashed_password)
+
+async def main(levels, logins_per_client):
+    hashed = get_password_hash("demo123")
+    print(f"{'mode':<10} {'clients':>8} {'logins/s':>10} {'max loop lag ms':>16}")
+    for name, verify in (("inline", verify_inline), ("pooled", verify_password_async)):
+        for clients in levels:
+            throughput, lag = await run(verify, clients, logins_per_client, hashed)
+            print(f"{name:<10} {clients:>8} {throughput:>10.1f} {lag * 1000:>16.1f}")
+    shutdown_hash_pool()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark password verification throughput")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--logins-per-client", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.logins_per_client))
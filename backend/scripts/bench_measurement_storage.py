@@ -0,0 +1,123 @@
+import sys
+import os
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.db.bulk import chunked
+from app.db.models import Base, MeasurementDaily, Station
+from app.db.session import create_db_engine
+from app.db.storage import STORAGE_TABLES, ensure_partitions
+from app.services.aqi_index import calculate_aqi
+from app.services.history import query_station_history
+
+# Synthetic history: row i belongs to station i % stations at hour i // stations
+BASE_TIME = datetime(2000, 1, 1)
+
+def synthetic_rows(table, first, last, stations):
+    index = np.arange(first, last)
+    rng = np.random.default_rng(first)
+    pm25 = np.round(rng.gamma(2.0, 40.0, len(index)), 1)
+    rows = pd.DataFrame({
+        "station_id": [f"bench-{i}" for i in (index % stations).tolist()],
+        "measured_at": pd.to_datetime(BASE_TIME) + pd.to_timedelta(index // stations, unit="h"),
+        "pm25": pm25,
+        "pm10": np.round(pm25 * 1.6, 1),
+        "aqi": calculate_aqi(pm25, "pm25").astype(int),
+    })
+    if "id" in table.c:
+        rows.insert(0, "id", [f"{i:032x}" for i in index.tolist()])
+    records = rows.to_dict("records")
+    for record in records:
+        record["measured_at"] = record["measured_at"].to_pydatetime()
+    return records
+
+def load(engine, table, first, last, stations, batch_size):
+    began = time.perf_counter()
+    for start in range(first, last, batch_size):
+        end = min(start + batch_size, last)
+        with engine.begin() as conn:
+            ensure_partitions(
+                conn,
+                BASE_TIME + timedelta(hours=start // stations),
+                BASE_TIME + timedelta(hours=(end - 1) // stations),
+                table
+            )
+            for chunk in chunked(synthetic_rows(table, start, end, stations), 10_000):
+                conn.execute(insert(table), chunk)
+    return time.perf_counter() - began
+
+def time_queries(engine, table, rows, stations, queries, resolution, window):
+    hours_loaded = rows // stations
+    latencies = []
+    with Session(engine) as db:
+        for _ in range(queries):
+            station_id = f"bench-{random.randrange(stations)}"
+            offset = random.randrange(max(1, hours_loaded - int(window.total_seconds() // 3600)))
+            start = BASE_TIME + timedelta(hours=offset)
+            began = time.perf_counter()
+            query_station_history(db, station_id, start, start + window, resolution=resolution, limit=5000, table=table)
+            latencies.append(time.perf_counter() - began)
+    return 1000 * np.percentile(latencies, 50), 1000 * np.percentile(latencies, 95)
+
+def database_size_mb(url):
+    if not url.startswith("sqlite:///"):
+        return None
+    path = url[len("sqlite:///"):]
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p)) / 2**20
+
+def bench(storage, url, row_levels, stations, queries, batch_size):
+    table = STORAGE_TABLES[storage]
+    engine = create_db_engine(url)
+    Base.metadata.create_all(engine, tables=[Station.__table__, table, MeasurementDaily.__table__])
+    with engine.begin() as conn:
+        conn.execute(insert(Station), [
+            {"id": f"bench-{i}", "name": f"Bench {i}", "city": "Bench", "latitude": 30.0, "longitude": 70.0, "is_active": True}
+            for i in range(stations)
+        ])
+
+    loaded = 0
+    for rows in sorted(row_levels):
+        load_seconds = load(engine, table, loaded, rows, stations, batch_size)
+        loaded = rows
+        raw_p50, raw_p95 = time_queries(engine, table, rows, stations, queries, "raw", timedelta(days=7))
+        day_p50, day_p95 = time_queries(engine, table, rows, stations, queries, "day", timedelta(days=90))
+        size = database_size_mb(url)
+        print(
+            f"{storage:<8} {rows:>12,} {load_seconds:>9.1f} "
+            f"{(f'{size:.0f}' if size is not None else '-'):>9} "
+            f"{raw_p50:>9.2f} {raw_p95:>9.2f} {day_p50:>9.2f} {day_p95:>9.2f}",
+            flush=True
+        )
+    engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark range-query latency of the measurement storage modes")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000, 100_000_000])
+    parser.add_argument("--storage", nargs="+", choices=sorted(STORAGE_TABLES), default=sorted(STORAGE_TABLES))
+    parser.add_argument("--stations", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=500_000)
+    parser.add_argument("--url", help="Empty database to benchmark in; defaults to a fresh SQLite file per mode")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="Where the SQLite files go")
+    args = parser.parse_args()
+
+    print(f"{'storage':<8} {'rows':>12} {'load s':>9} {'size MB':>9} {'7d p50':>9} {'7d p95':>9} {'90d p50':>9} {'90d p95':>9}")
+    print("(latencies in ms; 7d is a raw page, 90d is a daily rollup)")
+    for storage in args.storage:
+        url = args.url
+        if url is None:
+            path = os.path.join(args.dir, f"bench_measurements_{storage}.db")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            url = f"sqlite:///{path}"
+        bench(storage, url, args.rows, args.stations, args.queries, args.batch_size)
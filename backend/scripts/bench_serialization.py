@@ -0,0 +1,87 @@
+import sys
+import os
+import argparse
+import random
+import time
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.api.aqi import CurrentAqi, StationList
+from app.api.caching import encode_body
+from app.db.models import Station
+
+def snapshot_payload(rows):
+    return {
+        "data": [
+            {
+                "station_id": f"bench-{i}",
+                "station_name": f"Bench Station {i}",
+                "city": random.choice(["Lahore", "Karachi", "Islamabad", "Peshawar"]),
+                "latitude": round(random.uniform(24, 37), 4),
+                "longitude": round(random.uniform(61, 77), 4),
+                "pm25": round(random.uniform(10, 300), 1),
+                "aqi": random.randint(20, 400),
+                "last_updated": datetime.utcnow().isoformat()
+            }
+            for i in range(rows)
+        ],
+        "source": "bench",
+        "ingested_at": datetime.utcnow().isoformat()
+    }
+
+def stations_payload(rows):
+    # Detached ORM rows, as the stations route gets them from the session
+    return {
+        "stations": [
+            Station(
+                id=f"bench-{i}",
+                name=f"Bench Station {i}",
+                city="Lahore",
+                latitude=random.uniform(24, 37),
+                longitude=random.uniform(61, 77),
+                is_active=True
+            )
+            for i in range(rows)
+        ]
+    }
+
+def time_per_call(fn, min_seconds=0.5):
+    """Median wall time of fn() in milliseconds"""
+    fn()
+    samples = []
+    began = time.perf_counter()
+    while time.perf_counter() - began < min_seconds or len(samples) < 5:
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return 1000 * float(np.median(samples))
+
+def bench(rows):
+    snapshot = snapshot_payload(rows)
+    stations = stations_payload(rows)
+    pre_serialized = encode_body(snapshot, CurrentAqi)
+
+    paths = {
+        # What routes without a response model did: introspect, then json.dumps
+        "snapshot jsonable_encoder+json": lambda: JSONResponse(content=None).render(jsonable_encoder(snapshot)),
+        "snapshot orjson": lambda: ORJSONResponse(content=None).render(snapshot),
+        "snapshot response model": lambda: encode_body(snapshot, CurrentAqi),
+        "snapshot pre-serialized": lambda: encode_body(pre_serialized),
+        "stations jsonable_encoder+json": lambda: JSONResponse(content=None).render(jsonable_encoder(stations)),
+        "stations response model": lambda: encode_body(stations, StationList),
+    }
+    for name, fn in paths.items():
+        print(f"{rows:>8,} {name:<34} {time_per_call(fn):>10.3f}", flush=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-response JSON serialization cost of the API payloads")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 1_000, 10_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'path':<34} {'ms/resp':>10}")
+    for rows in args.rows:
+        bench(rows)
@@ -0,0 +1,51 @@
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import pandas as pd
+from sqlalchemy import func, select
+
+from app.db.models import MeasurementDaily, Station
+from app.db.session import engine
+from app.db.storage import measurement_table
+from app.services.rollups import apply_rollups, clear_rollups
+
+def rebuild(batch_size):
+    """
+    Recompute aqi_rollups from the stored raw readings. Ingestion keeps the
+    table current on its own; this is for existing history and for backfills
+    run with --skip-rollups.
+    """
+    table = measurement_table()
+    query = (
+        select(table.c.station_id, Station.city, table.c.measured_at, table.c.pm25, table.c.aqi)
+        .join(Station, Station.id == table.c.station_id)
+    )
+
+    began = time.perf_counter()
+    readings = 0
+    with engine.begin() as conn:
+        rolled_up_days = conn.scalar(select(func.count()).select_from(MeasurementDaily))
+        if rolled_up_days:
+            print(
+                f"Warning: {rolled_up_days} station-days only exist in measurement_daily "
+                "and won't be in the rebuilt rollups"
+            )
+
+        clear_rollups(conn)
+        # Stream the readings instead of loading the whole table
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        for rows in result.partitions():
+            frame = pd.DataFrame(rows, columns=["station_id", "city", "measured_at", "pm25", "aqi"])
+            apply_rollups(conn, frame)
+            readings += len(frame)
+            print(f"{readings} readings rolled up ({readings / (time.perf_counter() - began):.0f}/s)")
+    print(f"Done: {readings} readings")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the AQI rollup statistics from raw measurements")
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    args = parser.parse_args()
+    rebuild(args.batch_size)
@@ -0,0 +1,29 @@
+import sys
+import os
+import argparse
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.db.session import SessionLocal
+from app.services.forecast import MODELS, load_history_frame
+
+def train_model(model_name, days, output_path):
+    db = SessionLocal()
+    try:
+        frame = load_history_frame(db, datetime.utcnow() - timedelta(days=days))
+    finally:
+        db.close()
+
+    print(f"Training {model_name} on {len(frame)} readings from {frame['station_id'].nunique()} stations")
+    model = MODELS[model_name]().fit(frame)
+    model.save(output_path)
+    print(f"Saved model to {output_path}")
+    print(f"Set FORECAST_MODEL_PATH={output_path} to serve it")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit a forecast model on stored measurements")
+    parser.add_argument("--model", choices=sorted(MODELS), default="seasonal_ar")
+    parser.add_argument("--days", type=int, default=90, help="Days of history to train on")
+    parser.add_argument("--output", default="forecast_model.pkl")
+    args = parser.parse_args()
+    train_model(args.model, args.days, args.output)
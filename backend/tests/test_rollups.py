@@ -0,0 +1,151 @@
+import importlib.util
+import io
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import AqiRollup, Base, Measurement, MeasurementReading
+from app.db.storage import store_measurements
+from app.services.rollups import apply_rollups, decode_cursor, query_rollups
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts")
+
+BATCH = [
+    {"station_id": "lahore-1", "measured_at": datetime(2026, 1, 1, 10, 5), "pm25": 80.0, "pm10": None, "aqi": 164},
+    {"station_id": "lahore-1", "measured_at": datetime(2026, 1, 1, 10, 35), "pm25": 90.0, "pm10": None, "aqi": 169},
+    {"station_id": "lahore-1", "measured_at": datetime(2026, 1, 1, 11, 5), "pm25": 70.0, "pm10": None, "aqi": 158},
+]
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rollups.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+def hourly_samples(conn):
+    return dict(conn.execute(
+        select(AqiRollup.bucket, AqiRollup.samples)
+        .where(AqiRollup.scope == "station", AqiRollup.period == "hour")
+        .order_by(AqiRollup.bucket)
+    ).all())
+
+def test_same_batch_twice_is_rolled_up_once(engine):
+    table = MeasurementReading.__table__
+    for _ in range(2):
+        with engine.begin() as conn:
+            stored = store_measurements(conn, BATCH, table)
+            apply_rollups(conn, stored.assign(city="Lahore"))
+
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(table)) == 3
+        assert hourly_samples(conn) == {datetime(2026, 1, 1, 10): 2, datetime(2026, 1, 1, 11): 1}
+
+@pytest.fixture
+def backfill_measurements():
+    spec = importlib.util.spec_from_file_location(
+        "backfill_measurements", os.path.join(SCRIPTS_DIR, "backfill_measurements.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class RecordingCursor:
+    """DBAPI cursor that records COPY and SQL and returns the staged rows as inserted"""
+    def __init__(self):
+        self.statements = []
+        self.copied = None
+
+    def copy_expert(self, sql, buffer):
+        self.statements.append(sql)
+        self.copied = buffer.getvalue()
+
+    def execute(self, sql):
+        self.statements.append(sql)
+
+    def fetchall(self):
+        frame = pd.read_csv(io.StringIO(self.copied), header=None, names=["station_id", "pm25", "pm10", "aqi", "measured_at"])
+        return list(frame[["station_id", "measured_at", "pm25", "aqi"]].itertuples(index=False, name=None))
+
+    def close(self):
+        pass
+
+def recording_connection(cursor):
+    dbapi_connection = SimpleNamespace(cursor=lambda: cursor)
+    return SimpleNamespace(connection=SimpleNamespace(dbapi_connection=dbapi_connection))
+
+def test_copy_into_compact_storage_returns_the_inserted_rows(backfill_measurements):
+    table = MeasurementReading.__table__
+    measurements = backfill_measurements.to_measurements(pd.DataFrame(BATCH), table)
+    cursor = RecordingCursor()
+
+    stored = backfill_measurements.copy_measurements(recording_connection(cursor), table, measurements)
+
+    assert cursor.statements[1].startswith("COPY backfill_staging ")
+    assert cursor.statements[2].startswith(f"INSERT INTO {table.name} ")
+    assert "ON CONFLICT DO NOTHING RETURNING station_id, measured_at, pm25, aqi" in cursor.statements[2]
+    assert list(stored.columns) == ["station_id", "measured_at", "pm25", "aqi"]
+    assert len(stored) == 3
+
+def test_copy_into_legacy_storage_returns_the_batch(backfill_measurements):
+    table = Measurement.__table__
+    measurements = backfill_measurements.to_measurements(pd.DataFrame(BATCH), table)
+    cursor = RecordingCursor()
+
+    stored = backfill_measurements.copy_measurements(recording_connection(cursor), table, measurements)
+
+    assert cursor.statements == [f"COPY {table.name} (id, station_id, pm25, pm10, aqi, measured_at) FROM STDIN WITH (FORMAT csv)"]
+    assert list(stored.columns) == ["station_id", "measured_at", "pm25", "aqi"]
+    assert len(stored) == 3
+
+def test_backfill_twice_is_rolled_up_once(engine, tmp_path, monkeypatch, backfill_measurements):
+    monkeypatch.setattr(backfill_measurements, "engine", engine)
+    monkeypatch.setattr(settings, "MEASUREMENT_STORAGE", "compact")
+
+    source = tmp_path / "readings.csv"
+    pd.DataFrame([
+        {**row, "city": "Lahore", "latitude": 31.52, "longitude": 74.36, "measured_at": row["measured_at"].isoformat()}
+        for row in BATCH
+    ]).drop(columns=["pm10", "aqi"]).to_csv(source, index=False)
+
+    for _ in range(2):
+        backfill_measurements.backfill(
+            str(source), "csv", 100, 100, "readings",
+            restart=True, use_copy=False, default_city="Unknown"
+        )
+
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(MeasurementReading.__table__)) == 3
+        assert hourly_samples(conn) == {datetime(2026, 1, 1, 10): 2, datetime(2026, 1, 1, 11): 1}
+
+def test_rollup_pages_cover_every_scope(engine):
+    frame = pd.DataFrame([
+        {"station_id": f"{city}-1", "city": city, "measured_at": datetime(2026, 1, 1, hour), "pm25": 50.0, "aqi": 137}
+        for city in ("Islamabad", "Karachi", "Lahore")
+        for hour in range(4)
+    ])
+    with engine.begin() as conn:
+        apply_rollups(conn, frame)
+
+    pages = []
+    cursor = None
+    with Session(engine) as db:
+        while True:
+            page = query_rollups(
+                db, "city", "hour", datetime(2026, 1, 1), datetime(2026, 1, 2),
+                cursor=decode_cursor(cursor) if cursor else None, limit=5
+            )
+            pages.append(page["data"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+    assert [len(page) for page in pages] == [5, 5, 2]
+    rows = [(row["id"], row["timestamp"]) for page in pages for row in page]
+    assert rows == [(city, datetime(2026, 1, 1, hour).isoformat()) for city in ("Islamabad", "Karachi", "Lahore") for hour in range(4)]
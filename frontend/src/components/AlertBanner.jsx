@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react'
-import { alertsAPI } from '../services/alerts'
+import { alertsAPI, subscribeToAlertStream, showBrowserNotification } from '../services/alerts'
 
 const AlertBanner = () => {
   const [alerts, setAlerts] = useState([])
@@ -8,9 +8,15 @@ const AlertBanner = () => {
 
   useEffect(() => {
     loadAlerts()
-    // Check for new alerts every 5 minutes
-    const interval = setInterval(loadAlerts, 300000)
-    return () => clearInterval(interval)
+    // New alerts are pushed by the server instead of polled
+    return subscribeToAlertStream({
+      onAlert: (alert) => {
+        setAlerts((current) => [alert, ...current.filter((a) => a.id !== alert.id)])
+        setUnreadCount((count) => count + 1)
+        showBrowserNotification('CleanAirPK Alert', alert.message)
+      },
+      onResync: loadAlerts,
+    })
   }, [])
 
   const loadAlerts = async () => {
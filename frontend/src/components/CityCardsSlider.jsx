@@ -8,7 +8,14 @@ import 'swiper/css'
 import 'swiper/css/navigation'
 import 'swiper/css/pagination'
 
-const CityCardsSlider = ({ cities, selectedCity, onCityClick, loading }) => {
+// Highest forecast AQI over the next 24 hours, if the batch has this city
+const peakAqi = (forecasts, city) => {
+  const forecast = forecasts?.[city.toLowerCase()]
+  if (!forecast) return null
+  return Math.max(...forecast.forecast.slice(0, 24).map(point => point.aqi))
+}
+
+const CityCardsSlider = ({ cities, forecasts, selectedCity, onCityClick, loading }) => {
   if (loading) {
     return (
       <div className="bg-white rounded-lg shadow p-8 text-center">
@@ -65,6 +72,7 @@ const CityCardsSlider = ({ cities, selectedCity, onCityClick, loading }) => {
         >
           {cities.map((city) => {
             const aqiInfo = getAqiInfo(city.aqi)
+            const peak = peakAqi(forecasts, city.city)
             return (
               <SwiperSlide key={city.station_id}>
                 <div 
@@ -96,6 +104,12 @@ const CityCardsSlider = ({ cities, selectedCity, onCityClick, loading }) => {
                         <span className="text-gray-600">PM2.5:</span>
                         <span className="font-semibold text-gray-800">{city.pm25} μg/m³</span>
                       </div>
+                      {peak !== null && (
+                        <div className="flex justify-between items-center">
+                          <span className="text-gray-600">24h peak:</span>
+                          <span className={`font-semibold ${getAqiInfo(peak).textColor}`}>{peak} AQI</span>
+                        </div>
+                      )}
                       <div className="flex justify-between items-center">
                         <span className="text-gray-600">Updated:</span>
                         <span className="text-gray-500 text-xs">
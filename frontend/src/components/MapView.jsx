@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react'
 import { MapContainer, TileLayer, Marker, Popup, useMap } from 'react-leaflet'
 import L from 'leaflet'
-import { getAqiInfo } from '../services/aqi'
+import { getAqiInfo, AQI_TILE_URL } from '../services/aqi'
 
 // Fix for default markers in React-Leaflet
 delete L.Icon.Default.prototype._getIconUrl
@@ -55,6 +55,7 @@ const MapController = ({ selectedCity, cities }) => {
 
 const MapView = ({ cities, selectedCity, onCityClick, loading }) => {
   const [map, setMap] = useState(null)
+  const [showOverlay, setShowOverlay] = useState(true)
 
   // Default center (Pakistan)
   const defaultCenter = [30.3753, 69.3451]
@@ -81,9 +82,19 @@ const MapView = ({ cities, selectedCity, onCityClick, loading }) => {
 
   return (
     <div className="bg-white rounded-lg shadow-lg overflow-hidden">
-      <div className="p-4 border-b border-gray-200">
-        <h3 className="text-xl font-semibold text-gray-800">Pakistan Air Quality Map</h3>
-        <p className="text-sm text-gray-600">Click on markers to view station details</p>
+      <div className="p-4 border-b border-gray-200 flex justify-between items-start">
+        <div>
+          <h3 className="text-xl font-semibold text-gray-800">Pakistan Air Quality Map</h3>
+          <p className="text-sm text-gray-600">Click on markers to view station details</p>
+        </div>
+        <label className="flex items-center space-x-2 text-sm text-gray-600">
+          <input
+            type="checkbox"
+            checked={showOverlay}
+            onChange={(e) => setShowOverlay(e.target.checked)}
+          />
+          <span>Interpolated AQI</span>
+        </label>
       </div>
       
       <div className="h-96 w-full relative">
@@ -97,6 +108,11 @@ const MapView = ({ cities, selectedCity, onCityClick, loading }) => {
             attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
             url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
           />
+
+          {/* AQI interpolated between stations, rendered server-side */}
+          {showOverlay && (
+            <TileLayer url={AQI_TILE_URL} opacity={0.6} maxZoom={12} zIndex={2} />
+          )}
           
           <MapController selectedCity={selectedCity} cities={cities} />
           
@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react'
 import { Link } from 'react-router-dom'
 import { useTranslation } from 'react-i18next'
 import { aqiAPI } from '../services/aqi'
-import { forecastAPI } from '../services/forecast'
+import { forecastAPI, splitBatchForecast } from '../services/forecast'
 import ForecastChart from '../components/ForecastChart'
 import CityCardsSlider from '../components/CityCardsSlider'
 import CitySelector from '../components/CitySelector'
@@ -15,6 +15,7 @@ export default function Dashboard() {
   const user = JSON.parse(localStorage.getItem('user') || '{}')
   const [aqiData, setAqiData] = useState(null)
   const [forecastData, setForecastData] = useState(null)
+  const [forecasts, setForecasts] = useState(null)
   const [selectedCity, setSelectedCity] = useState('Islamabad')
   const [activeTab, setActiveTab] = useState('cards')
   const [loading, setLoading] = useState(true)
@@ -26,16 +27,24 @@ export default function Dashboard() {
   }, [])
 
   useEffect(() => {
-    if (selectedCity && selectedCity !== 'All Cities') {
+    if (!selectedCity || selectedCity === 'All Cities' || !forecasts) {
+      return
+    }
+    // Served from the batch when possible, otherwise fetched on its own
+    const batched = forecasts[selectedCity.toLowerCase()]
+    if (batched) {
+      setForecastData(batched)
+    } else {
       loadForecast(selectedCity)
     }
-  }, [selectedCity])
+  }, [selectedCity, forecasts])
 
   const loadAqiData = async () => {
     try {
       setLoading(true)
       const response = await aqiAPI.getCurrent()
       setAqiData(response.data)
+      loadForecasts([...new Set((response.data.data || []).map(city => city.city))])
       
       if (response.data.data && response.data.data.length > 0) {
         const islamabadCity = response.data.data.find(city => 
@@ -55,6 +64,16 @@ export default function Dashboard() {
     }
   }
 
+  const loadForecasts = async (cities) => {
+    try {
+      const response = await forecastAPI.getBatchForecast(cities, 48)
+      setForecasts(splitBatchForecast(response.data))
+    } catch (err) {
+      console.error('Batch forecast error:', err)
+      setForecasts({})
+    }
+  }
+
   const loadForecast = async (city) => {
     try {
       setForecastLoading(true)
@@ -160,6 +179,7 @@ export default function Dashboard() {
           <div className="mb-8 bg-white rounded-xl shadow-lg p-6 mx-2">
             <CityCardsSlider 
               cities={aqiData?.data || []}
+              forecasts={forecasts}
               selectedCity={selectedCity}
               onCityClick={handleCityCardClick}
               loading={loading}
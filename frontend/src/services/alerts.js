@@ -1,4 +1,4 @@
-import api from './api'
+import api, { API_BASE_URL } from './api'
 
 export const alertsAPI = {
   getAlerts: () => api.get('/api/alerts/'),
@@ -8,6 +8,27 @@ export const alertsAPI = {
   markAllRead: () => api.post('/api/alerts/mark-all-read'),
 }
 
+// Server-pushed alerts and AQI updates (Server-Sent Events)
+export const subscribeToAlertStream = ({ onAlert, onAqi, onResync } = {}) => {
+  const token = localStorage.getItem('token')
+  if (!token || !('EventSource' in window)) {
+    return () => {}
+  }
+
+  const source = new EventSource(`${API_BASE_URL}/api/stream/events?token=${encodeURIComponent(token)}`)
+  if (onAlert) {
+    source.addEventListener('alert', (event) => onAlert(JSON.parse(event.data)))
+  }
+  if (onAqi) {
+    source.addEventListener('aqi', (event) => onAqi(JSON.parse(event.data)))
+  }
+  if (onResync) {
+    source.addEventListener('resync', () => onResync())
+  }
+
+  return () => source.close()
+}
+
 // Browser notifications
 export const requestNotificationPermission = async () => {
   if (!('Notification' in window)) {
@@ -1,4 +1,4 @@
-import api from './api'
+import api, { API_BASE_URL } from './api'
 
 export const aqiAPI = {
   getCurrent: (params = {}) => api.get('/api/aqi/current', { params }),
@@ -6,6 +6,9 @@ export const aqiAPI = {
   getHistorical: (stationId, days = 7) => api.get(`/api/aqi/historical/${stationId}?days=${days}`),
 }
 
+// Leaflet URL template for the interpolated AQI overlay tiles
+export const AQI_TILE_URL = `${API_BASE_URL}/api/aqi/tiles/{z}/{x}/{y}.png`
+
 // Helper function to get AQI level and color
 export const getAqiInfo = (aqi) => {
   if (aqi <= 50) {
@@ -2,4 +2,28 @@ import api from './api'
 
 export const forecastAPI = {
   getForecast: (city, hours = 48) => api.get('/api/forecast/', { params: { city, hours } }),
-}
\ No newline at end of file
+  // Every city in one request and one model pass
+  getBatchForecast: (cities, hours = 48) => api.post('/api/forecast/batch', { cities, hours }),
+}
+
+// Split the columnar batch response into per-city objects shaped like
+// /api/forecast/ responses, keyed by lower-cased city name
+export const splitBatchForecast = (batch) => {
+  const forecasts = {}
+  batch.cities.forEach((city, i) => {
+    forecasts[city.toLowerCase()] = {
+      city,
+      forecast_hours: batch.hours,
+      forecast: batch.timestamps.map((timestamp, j) => ({
+        timestamp,
+        pm25: batch.pm25[i][j],
+        confidence_lower: batch.confidence_lower[i][j],
+        confidence_upper: batch.confidence_upper[i][j],
+        aqi: batch.aqi[i][j],
+      })),
+      source: batch.sources[i],
+      generated_at: batch.generated_at,
+    }
+  })
+  return forecasts
+}